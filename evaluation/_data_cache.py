@@ -0,0 +1,22 @@
+"""Carga memoizada de los ficheros de datos compartidos por las evaluaciones."""
+
+import functools
+import json
+from typing import Any, Dict, Tuple
+
+
+def _read_jsonl(path: str) -> Tuple[Dict[str, Any], ...]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return tuple(json.loads(line) for line in f)
+
+
+@functools.lru_cache(maxsize=None)
+def load_corpus(path: str) -> Tuple[Dict[str, Any], ...]:
+    """Carga el corpus (JSON Lines) una sola vez por proceso; no debe modificarse."""
+    return _read_jsonl(path)
+
+
+@functools.lru_cache(maxsize=None)
+def load_queries(path: str) -> Tuple[Dict[str, Any], ...]:
+    """Carga las consultas (JSON Lines) una sola vez por proceso; no debe modificarse."""
+    return _read_jsonl(path)
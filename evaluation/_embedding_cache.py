@@ -0,0 +1,90 @@
+"""Caché persistente de embeddings compartida entre ejecuciones de evaluación."""
+
+import hashlib
+import os
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".embcache")
+
+# Modelo de embeddings del servidor; al cambiarlo los vectores guardados dejan de ser comparables
+EMBEDDING_MODEL = os.getenv("RAG_EMBEDDING_MODEL", "text-embedding-3-large")
+
+# Embedding cuantizado a int8 junto con su escala (max|v|), v ≈ q * escala / 127
+QuantizedEmbedding = Tuple[np.ndarray, float]
+
+
+def _normalize(text: str) -> str:
+    """Normaliza mayúsculas y espacios para que variantes triviales compartan entrada."""
+    return " ".join(text.casefold().split())
+
+
+def quantize(embedding: List[float]) -> QuantizedEmbedding:
+    """Cuantiza un embedding a int8 con una escala por fila."""
+    vector = np.asarray(embedding, dtype=np.float32)
+    scale = float(np.abs(vector).max())
+    if scale == 0.0:
+        return np.zeros(vector.shape, dtype=np.int8), 0.0
+    return np.round(vector * (127 / scale)).astype(np.int8), scale
+
+
+def cosine_similarity(a: QuantizedEmbedding, b: QuantizedEmbedding) -> float:
+    """Similitud coseno entre dos embeddings cuantizados; las escalas se cancelan."""
+    # int32 evita el desbordamiento que tendría acumular productos de int8 en int16
+    qa = a[0].astype(np.int32)
+    qb = b[0].astype(np.int32)
+    norm = np.sqrt(float(qa @ qa) * float(qb @ qb))
+    return float(qa @ qb) / norm if norm else 0.0
+
+
+class EmbeddingCache:
+    """Caché texto -> embedding cuantizado en memoria respaldada por SQLite.
+
+    La caché pertenece a un único modelo: si el guardado no coincide con `model`, se vacía.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, model: str = EMBEDDING_MODEL):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.model = model
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "embeddings.sqlite3"))
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings_q8 "
+            "(key BLOB PRIMARY KEY, vector BLOB NOT NULL, scale REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'model'").fetchone()
+        if row is None or row[0] != model:
+            self._conn.execute("DELETE FROM embeddings_q8")
+            self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('model', ?)", (model,))
+            self._conn.commit()
+        self._memory: Dict[bytes, QuantizedEmbedding] = {}
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(_normalize(text).encode("utf-8"), digest_size=16).digest()
+
+    def get(self, text: str) -> Optional[QuantizedEmbedding]:
+        """Devuelve el embedding cacheado de `text` o None si no existe."""
+        key = self._key(text)
+        entry = self._memory.get(key)
+        if entry is None:
+            row = self._conn.execute(
+                "SELECT vector, scale FROM embeddings_q8 WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            entry = self._memory[key] = (np.frombuffer(row[0], dtype=np.int8), row[1])
+        return entry
+
+    def put(self, text: str, embedding: List[float]) -> QuantizedEmbedding:
+        """Cuantiza y guarda el embedding de `text` en memoria y en disco."""
+        key = self._key(text)
+        entry = self._memory[key] = quantize(embedding)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO embeddings_q8 (key, vector, scale) VALUES (?, ?, ?)",
+            (key, entry[0].tobytes(), entry[1]),
+        )
+        self._conn.commit()
+        return entry
@@ -0,0 +1,73 @@
+"""Caché en disco de respuestas del endpoint de consultas, compartida por las evaluaciones.
+
+La caché solo vale dentro de una ejecución del pipeline: entre ejecuciones pueden cambiar
+el recuperador, los prompts o el servidor, y las respuestas guardadas ya no serían válidas.
+"""
+
+import glob
+import os
+import shelve
+import uuid
+from hashlib import blake2b
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".rag_cache")
+
+# Variable de entorno con el identificador de la ejecución; los procesos hijos la heredan
+RUN_ID_ENV = "RAG_RUN_ID"
+
+
+def start_run() -> str:
+    """Inicia una ejecución nueva del pipeline descartando las respuestas de ejecuciones anteriores."""
+    for path in glob.glob(CACHE_PATH + "*"):
+        os.remove(path)
+    run_id = os.environ[RUN_ID_ENV] = uuid.uuid4().hex
+    return run_id
+
+
+def _run_id() -> Optional[str]:
+    # Fuera de una ejecución del pipeline (p. ej. un evaluador lanzado a mano) no se cachea
+    return os.environ.get(RUN_ID_ENV)
+
+
+def make_key(*parts: Any) -> str:
+    """Construye la clave de caché a partir de la consulta, el corpus y la ejecución actual."""
+    raw = "\x1f".join(str(part) for part in (_run_id(), *parts))
+    return blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def contains_all(keys: Iterable[str]) -> bool:
+    """Indica si todas las `keys` tienen respuesta guardada en la ejecución actual."""
+    if _run_id() is None:
+        return False
+    with shelve.open(CACHE_PATH) as db:
+        return all(key in db for key in keys)
+
+
+def get_or_fetch(key: str, fetch_fn: Callable[[], Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+    """Devuelve la respuesta guardada bajo `key` o la obtiene con `fetch_fn` y la guarda.
+
+    El segundo elemento indica si la respuesta salió de la caché.
+    """
+    if _run_id() is None:
+        return fetch_fn(), False
+    with shelve.open(CACHE_PATH) as db:
+        if key in db:
+            return db[key], True
+    value = fetch_fn()
+    with shelve.open(CACHE_PATH) as db:
+        db[key] = value
+    return value, False
+
+
+def remap_document_ids(response: Dict[str, Any], mapping: Dict[str, str]) -> Dict[str, Any]:
+    """Copia de `response` con el document_id de cada chunk traducido según `mapping`.
+
+    Los document_id de la API cambian en cada recarga del corpus, así que la caché
+    guarda identificadores estables (hash del contenido) y se traducen al leer.
+    """
+    chunks = [
+        {**chunk, "document_id": mapping.get(chunk["document_id"], chunk["document_id"])}
+        for chunk in response.get("retrieved_chunks", [])
+    ]
+    return {**response, "retrieved_chunks": chunks}
@@ -0,0 +1,142 @@
+"""Subida del corpus al sistema RAG y consultas cacheadas, compartidas por las evaluaciones."""
+
+import os
+import time
+from collections import deque
+from hashlib import blake2b
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+import requests
+from tqdm import tqdm
+
+from _rag_cache import contains_all, get_or_fetch, make_key, remap_document_ids
+
+# Espera máxima a que se indexe el corpus; sin fijarla, escala con el número de documentos
+INDEX_TIMEOUT = float(os.getenv("RAG_INDEX_TIMEOUT", "0")) or None
+INDEX_SECONDS_PER_DOC = 0.5
+MAX_POLL_INTERVAL = 5.0
+# Consultas de estado por sondeo sin avances; se van rotando entre los documentos pendientes
+STATUS_PROBE_LIMIT = 20
+# Una petición colgada cuenta como sondeo fallido en lugar de bloquear hasta el timeout del paso
+REQUEST_TIMEOUT = 30.0
+
+
+class RAGCorpus:
+    """Corpus de evaluación cargado en el sistema RAG.
+
+    Cada documento se identifica por el hash de su contenido (id estable): los textos
+    repetidos se suben una sola vez y las respuestas se cachean con ids estables, ya
+    que los document_id de la API cambian en cada recarga del corpus.
+    """
+
+    def __init__(self, api_base_url: str, corpus: Iterable[Dict[str, Any]]):
+        self.api_base_url = api_base_url
+        self._stable_ids: Dict[str, str] = {}  # _id del corpus -> id estable
+        self._unique_docs: Dict[str, Dict[str, Any]] = {}  # id estable -> primer documento con ese texto
+        for doc in corpus:
+            h = blake2b(doc['text'].encode('utf-8'), digest_size=16).hexdigest()
+            self._stable_ids[doc['_id']] = h
+            self._unique_docs.setdefault(h, doc)
+        self.fingerprint = blake2b("".join(sorted(self._unique_docs)).encode('ascii'), digest_size=16).hexdigest()
+        self._to_api: Dict[str, str] = {}  # id estable -> document_id en la API
+        self._to_stable: Dict[str, str] = {}  # document_id en la API -> id estable
+
+    def load(
+        self,
+        reset_fn: Callable[[], None],
+        upload_fn: Callable[[str, str], str],
+        questions: Sequence[str],
+        top_k: int
+    ) -> None:
+        """Reinicia el sistema RAG, sube el corpus y espera a que se indexe.
+
+        Si todas las `questions` ya tienen respuesta en la caché de esta ejecución no se
+        consultará el servidor, así que se omite la recarga y se trabaja con ids estables.
+        """
+        if contains_all(make_key(self.fingerprint, top_k, question) for question in questions):
+            print("Todas las consultas tienen respuesta en la cache de esta ejecucion; no se recarga el corpus")
+            return
+        reset_fn()
+        self.upload(upload_fn)
+        self.wait_ready()
+
+    def upload(self, upload_fn: Callable[[str, str], str]) -> None:
+        """Sube cada texto distinto una sola vez con `upload_fn(texto, _id)`."""
+        print(f"Subiendo {len(self._stable_ids)} documentos...")
+        for h, doc in tqdm(self._unique_docs.items(), desc="Subiendo documentos"):
+            api_id = upload_fn(doc['text'], doc['_id'])
+            self._to_api[h] = api_id
+            self._to_stable[api_id] = h
+        print(f"Subida completa ({len(self._to_api)} documentos unicos). Esperando procesamiento...")
+
+    def wait_ready(self, timeout: Optional[float] = None) -> None:
+        """Espera a que el almacén vectorial tenga indexados todos los documentos subidos.
+
+        Los documentos cuyo procesamiento falla o no produce chunks nunca llegarán al
+        índice, así que se descartan en cuanto su estado lo indica; mientras el índice no
+        avanza se consulta el estado de hasta STATUS_PROBE_LIMIT pendientes por sondeo.
+        Si se agota `timeout` se avisa y la evaluación continúa con lo ya indexado.
+        """
+        if timeout is None:
+            timeout = INDEX_TIMEOUT or max(60.0, INDEX_SECONDS_PER_DOC * len(self._to_api))
+        deadline = time.monotonic() + timeout
+        pending = set(self._to_api.values())
+        to_probe: deque = deque()
+        interval = 0.5
+        stalled = False
+        while True:
+            try:
+                response = requests.get(f"{self.api_base_url}/documents/list-unique", timeout=REQUEST_TIMEOUT)
+                response.raise_for_status()
+                remaining = pending - {doc['document_id'] for doc in response.json().get('documents', [])}
+            except requests.Timeout:
+                remaining = pending
+            if stalled and len(remaining) == len(pending):
+                if not to_probe:
+                    to_probe.extend(remaining)
+                batch = [to_probe.popleft() for _ in range(min(STATUS_PROBE_LIMIT, len(to_probe)))]
+                failed = {document_id for document_id in batch if document_id in remaining and self._processing_failed(document_id)}
+                if failed:
+                    print(f"Advertencia: {len(failed)} documentos fallaron o no generaron chunks; no se esperaran")
+                    remaining -= failed
+            stalled = len(remaining) == len(pending)
+            pending = remaining
+            if not pending:
+                return
+            if time.monotonic() + interval > deadline:
+                print(f"Advertencia: {len(pending)} documentos sin indexar tras {timeout:.0f}s; se continua con los ya indexados")
+                return
+            time.sleep(interval)
+            interval = min(interval * 1.5, MAX_POLL_INTERVAL)
+
+    def _processing_failed(self, document_id: str) -> bool:
+        """Indica si el procesamiento de `document_id` terminó sin chunks que indexar."""
+        try:
+            response = requests.get(f"{self.api_base_url}/documents/status/{document_id}", timeout=REQUEST_TIMEOUT)
+        except requests.Timeout:
+            return False
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        status = response.json()
+        return status.get('status') == 'failed' or (
+            status.get('status') == 'completed' and status.get('total_chunks', 0) == 0
+        )
+
+    def document_id(self, corpus_id: str) -> Optional[str]:
+        """document_id en la API del documento `corpus_id`, o su id estable si no se ha subido."""
+        stable_id = self._stable_ids.get(corpus_id)
+        return self._to_api.get(stable_id, stable_id)
+
+    def query(
+        self,
+        question: str,
+        top_k: int,
+        run_query_fn: Callable[[str, int], Dict[str, Any]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Respuesta a `question` con `run_query_fn(question, top_k)` y si salió de la caché."""
+        response, cached = get_or_fetch(
+            make_key(self.fingerprint, top_k, question),
+            lambda: remap_document_ids(run_query_fn(question, top_k), self._to_stable)
+        )
+        return remap_document_ids(response, self._to_api), cached
@@ -1,6 +1,6 @@
 import os
+import sys
 import json
-import time
 import requests
 from dotenv import load_dotenv
 from rouge_score import rouge_scorer
@@ -10,6 +10,9 @@ from nltk.translate.bleu_score import sentence_bleu
 from tqdm import tqdm
 import numpy as np
 
+from _data_cache import load_corpus, load_queries
+from _rag_corpus import RAGCorpus
+
 # --- Configuración ---
 load_dotenv()
 API_BASE_URL = os.getenv("API_URL", "http://localhost:8000/api/v1")
@@ -49,8 +52,8 @@ def upload_document_from_text(text, doc_id):
     response.raise_for_status()
     return response.json().get('document_id')
 
-def run_query(question):
-    payload = {"query": question, "top_k": 10}
+def run_query(question, top_k=10):
+    payload = {"query": question, "top_k": top_k}
     response = requests.post(f"{API_BASE_URL}/query/", json=payload)
     response.raise_for_status()
     return response.json()
@@ -95,33 +98,31 @@ def calculate_hit_rate_at_k(retrieved_doc_ids, expected_doc_id, k=5):
     return 1.0 if expected_doc_id in retrieved_doc_ids[:k] else 0.0
 
 # --- Script Principal ---
-def main():
+def main() -> int:
     dataset_name = detect_dataset_name(CORPUS_PATH)
-    # El nombre del archivo de resultados ya no necesita el motor
-    RESULTS_PATH = f"evaluation/{dataset_name}_full_metrics_results.json"
+    # El nombre del archivo de resultados ya no necesita el motor; es el que leen
+    # visualize_metrics.py y example_usage.py
+    RESULTS_PATH = f"evaluation/{dataset_name}_results.json"
     
     print(f"--- Evaluación Completa RAG | Dataset: {dataset_name.upper()} ---")
 
     # 1. Cargar datos
-    with open(CORPUS_PATH, 'r', encoding='utf-8') as f:
-        corpus = [json.loads(line) for line in f]
-    with open(QUERIES_SAMPLE_PATH, 'r', encoding='utf-8') as f:
-        qa_sample = [json.loads(line) for line in f]
+    corpus = load_corpus(CORPUS_PATH)
+    qa_sample = load_queries(QUERIES_SAMPLE_PATH)
     corpus_map = {item['_id']: item['text'] for item in corpus}
 
     # 2. Preparar entorno
-    reset_rag_system()
-    print(f"Subiendo {len(corpus)} documentos...")
-    api_doc_id_map = {
-        fiqa_doc['_id']: upload_document_from_text(fiqa_doc['text'], fiqa_doc['_id'])
-        for fiqa_doc in tqdm(corpus, desc="Subiendo documentos")
-    }
-    print("Subida completa. Esperando procesamiento...")
-    time.sleep(15)
+    rag_corpus = RAGCorpus(API_BASE_URL, corpus)
+    rag_corpus.load(
+        reset_rag_system,
+        upload_document_from_text,
+        [qa['text'] for qa in qa_sample if qa['_id'] in corpus_map],
+        10
+    )
 
     # 3. Construir dataset de evaluación
     eval_dataset = [
-        {"question": qa['text'], "ideal_answer": corpus_map[qa['_id']], "expected_doc_id": api_doc_id_map.get(qa['_id'])}
+        {"question": qa['text'], "ideal_answer": corpus_map[qa['_id']], "expected_doc_id": rag_corpus.document_id(qa['_id'])}
         for qa in qa_sample if qa['_id'] in corpus_map
     ]
 
@@ -129,9 +130,10 @@ def main():
     detailed_results = []
     for item in tqdm(eval_dataset, desc=f"Evaluando con motor original"):
         try:
-            api_response = run_query(item['question']) # Llamada simplificada
+            api_response, cached = rag_corpus.query(item['question'], 10, run_query)
             retrieved_chunks = api_response.get('retrieved_chunks', [])
-            retrieved_doc_ids = list(set(chunk['document_id'] for chunk in retrieved_chunks))
+            # dict.fromkeys elimina duplicados conservando el orden del ranking
+            retrieved_doc_ids = list(dict.fromkeys(chunk['document_id'] for chunk in retrieved_chunks))
             
             quality_metrics = calculate_metrics(api_response.get('answer', ''), item['ideal_answer'], item['question'])
             
@@ -145,7 +147,8 @@ def main():
                 "retrieval_info": {
                     "expected_doc_id": item['expected_doc_id'],
                     "retrieved_doc_ids": retrieved_doc_ids,
-                    "is_hit": item['expected_doc_id'] in retrieved_doc_ids[:5]
+                    "is_hit": item['expected_doc_id'] in retrieved_doc_ids[:5],
+                    "cached": cached
                 }
             })
         except Exception as e:
@@ -170,7 +173,8 @@ def main():
     print("\n--- Evaluación Completada ---")
     print(json.dumps(summary, indent=4))
     print(f"Resultados guardados en: {RESULTS_PATH}")
+    return 0
 
 if __name__ == "__main__":
     # La ejecución vuelve a ser directa, sin argumentos
-    main() 
\ No newline at end of file
+    sys.exit(main())
@@ -1,33 +1,47 @@
 import os
+import sys
+import gzip
 import json
-import time
+import orjson
+import shelve
+from hashlib import blake2b
 import requests
 import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
 from rouge_score import rouge_scorer
-import nltk
 from nltk.translate.bleu_score import sentence_bleu
 from tqdm import tqdm
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 import scipy.stats as stats
+from numba import njit, prange
 from sklearn.metrics import precision_score, recall_score, f1_score
 import warnings
 warnings.filterwarnings('ignore')
 
+from _data_cache import load_corpus, load_queries
+from _embedding_cache import EmbeddingCache, QuantizedEmbedding, cosine_similarity
+from _rag_corpus import RAGCorpus
+
 # --- Configuración ---
 load_dotenv()
 API_BASE_URL = os.getenv("API_URL", "http://localhost:8000/api/v1")
 RAW_DATA_DIR = "evaluation/raw_data"
 CORPUS_PATH = os.path.join(RAW_DATA_DIR, 'corpus.json')
 QUERIES_SAMPLE_PATH = os.path.join(RAW_DATA_DIR, 'queries_sample.json')
+GZIP_THRESHOLD_BYTES = 1 << 20  # Por debajo de 1MB no compensa comprimir
+METRIC_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".metric_cache")
+METRICS_VERSION = 1  # Incrementar al cambiar la definición de las métricas para invalidar la caché
 
-# --- Descarga de NLTK ---
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    print("Descargando el tokenizador 'punkt' de NLTK...")
-    nltk.download('punkt', quiet=True)
+@njit(parallel=True, fastmath=True, cache=True)
+def _bootstrap_means(values: np.ndarray, n_bootstrap: int, out: np.ndarray) -> None:
+    """Calcula en `out` las medias de `n_bootstrap` remuestreos de `values` sin materializar los índices."""
+    n = values.shape[0]
+    for b in prange(n_bootstrap):
+        s = 0.0
+        for _ in range(n):
+            s += values[np.random.randint(0, n)]
+        out[b] = s / n
 
 class AdvancedRAGEvaluator:
     """Evaluador avanzado de RAG con bootstraping y métricas adicionales."""
@@ -35,6 +49,9 @@ class AdvancedRAGEvaluator:
     def __init__(self, api_base_url: str):
         self.api_base_url = api_base_url
         self.rouge_scorer = rouge_scorer.RougeScorer(['rouge1', 'rouge2', 'rougeL'], use_stemmer=True)
+        self.embedding_cache = EmbeddingCache()
+        # evaluate_dataset abre la caché en disco durante su bucle; fuera de él solo se memoiza en memoria
+        self.metric_cache: Dict[str, Dict[str, float]] = {}
         
     def reset_rag_system(self):
         """Limpia la base de datos del sistema RAG."""
@@ -58,20 +75,45 @@ class AdvancedRAGEvaluator:
         response.raise_for_status()
         return response.json()
     
-    def get_embedding(self, text: str) -> List[float]:
-        """Obtiene el embedding de un texto."""
+    def get_embedding(self, text: str) -> Optional[QuantizedEmbedding]:
+        """Obtiene el embedding cuantizado de un texto, reutilizando la caché local si ya se calculó."""
+        cached = self.embedding_cache.get(text)
+        if cached is not None:
+            return cached
         try:
             response = requests.post(f"{self.api_base_url}/embeddings/generate", json={"text": text})
             response.raise_for_status()
-            return response.json().get("embedding", [])
+            embedding = response.json().get("embedding", [])
         except requests.RequestException:
-            return []
+            return None
+        if not embedding:
+            return None
+        return self.embedding_cache.put(text, embedding)
     
     def calculate_advanced_metrics(self, generated_answer: str, ideal_answer: str, question: str) -> Dict[str, float]:
-        """Calcula métricas avanzadas de calidad de respuesta."""
-        # Tokenización
-        ideal_tokens = [nltk.word_tokenize(ideal_answer.lower())]
-        generated_tokens = nltk.word_tokenize(generated_answer.lower())
+        """Calcula métricas avanzadas de calidad de respuesta, memoizadas en disco entre ejecuciones."""
+        # semantic_coherence depende del modelo de embeddings, así que también forma parte de la clave
+        key = blake2b(
+            "\x1f".join(
+                (str(METRICS_VERSION), self.embedding_cache.model, generated_answer, ideal_answer, question)
+            ).encode('utf-8'),
+            digest_size=16
+        ).hexdigest()
+        metrics = self.metric_cache.get(key)
+        if metrics is None:
+            metrics = self._compute_advanced_metrics(generated_answer, ideal_answer, question)
+            # Sin embeddings la coherencia queda en 0.0; no se memoiza para reintentarla
+            if self.embedding_cache.get(question) is not None and self.embedding_cache.get(generated_answer) is not None:
+                self.metric_cache[key] = metrics
+        return metrics
+    
+    def _compute_advanced_metrics(self, generated_answer: str, ideal_answer: str, question: str) -> Dict[str, float]:
+        """Calcula las métricas de calidad de respuesta sin pasar por la caché."""
+        # Tokenización (una sola pasada por texto, reutilizada por todas las métricas)
+        generated_tokens = generated_answer.lower().split()
+        ideal_tokens = ideal_answer.lower().split()
+        generated_words = set(generated_tokens)
+        ideal_words = set(ideal_tokens)
         
         # ROUGE Scores
         rouge_scores = self.rouge_scorer.score(ideal_answer, generated_answer)
@@ -80,26 +122,25 @@ class AdvancedRAGEvaluator:
         rouge_l = rouge_scores['rougeL'].fmeasure
         
         # BLEU Score
-        bleu_score = sentence_bleu(ideal_tokens, generated_tokens, weights=(0.25, 0.25, 0.25, 0.25))
+        bleu_score = sentence_bleu([ideal_tokens], generated_tokens, weights=(0.25, 0.25, 0.25, 0.25))
         
         # Coherencia semántica
-        q_embedding = np.array(self.get_embedding(question))
-        a_embedding = np.array(self.get_embedding(generated_answer))
+        q_embedding = self.get_embedding(question)
+        a_embedding = self.get_embedding(generated_answer)
         
         semantic_coherence = 0.0
-        if len(q_embedding) > 0 and len(a_embedding) > 0:
-            semantic_coherence = np.dot(q_embedding, a_embedding) / (np.linalg.norm(q_embedding) * np.linalg.norm(a_embedding))
+        if q_embedding is not None and a_embedding is not None:
+            semantic_coherence = cosine_similarity(q_embedding, a_embedding)
         
         # Longitud de respuesta
-        answer_length = len(generated_answer.split())
-        ideal_length = len(ideal_answer.split())
+        answer_length = len(generated_tokens)
+        ideal_length = len(ideal_tokens)
         length_ratio = answer_length / max(ideal_length, 1)
         
         # Exactitud de palabras clave
-        ideal_words = set(ideal_answer.lower().split())
-        generated_words = set(generated_answer.lower().split())
-        keyword_precision = len(ideal_words.intersection(generated_words)) / max(len(generated_words), 1)
-        keyword_recall = len(ideal_words.intersection(generated_words)) / max(len(ideal_words), 1)
+        common_words = len(ideal_words & generated_words)
+        keyword_precision = common_words / max(len(generated_words), 1)
+        keyword_recall = common_words / max(len(ideal_words), 1)
         keyword_f1 = 2 * (keyword_precision * keyword_recall) / max(keyword_precision + keyword_recall, 1e-8)
         
         return {
@@ -114,13 +155,13 @@ class AdvancedRAGEvaluator:
             "keyword_f1": keyword_f1
         }
     
-    def calculate_retrieval_metrics(self, retrieved_doc_ids: List[str], expected_doc_id: str, k_values: List[int] = [1, 3, 5, 10]) -> Dict[str, float]:
+    def calculate_retrieval_metrics(self, retrieved_doc_ids: List[str], expected_doc_id: str, k_values: Tuple[int, ...] = (1, 3, 5, 10)) -> Dict[str, float]:
         """Calcula métricas de recuperación para diferentes valores de k."""
-        metrics = {}
-        for k in k_values:
-            hit_rate = 1.0 if expected_doc_id in retrieved_doc_ids[:k] else 0.0
-            metrics[f"hit_rate_at_{k}"] = hit_rate
-        return metrics
+        try:
+            rank = retrieved_doc_ids.index(expected_doc_id)
+        except ValueError:
+            rank = float("inf")
+        return {f"hit_rate_at_{k}": float(rank < k) for k in k_values}
     
     def bootstrap_confidence_intervals(self, metrics_list: List[Dict[str, float]], confidence_level: float = 0.95, n_bootstrap: int = 1000) -> Dict[str, Dict[str, float]]:
         """Calcula intervalos de confianza usando bootstraping."""
@@ -131,27 +172,23 @@ class AdvancedRAGEvaluator:
         bootstrap_results = {}
         
         for metric_name in metric_names:
-            values = [result[metric_name] for result in metrics_list if metric_name in result]
-            if not values:
+            values = np.array([result[metric_name] for result in metrics_list if metric_name in result], dtype=np.float64)
+            if not values.size:
                 continue
                 
-            bootstrap_samples = []
-            for _ in range(n_bootstrap):
-                sample = np.random.choice(values, size=len(values), replace=True)
-                bootstrap_samples.append(np.mean(sample))
-            
-            bootstrap_samples = np.array(bootstrap_samples)
+            bootstrap_samples = np.empty(n_bootstrap, dtype=np.float64)
+            _bootstrap_means(values, n_bootstrap, bootstrap_samples)
             lower_percentile = (1 - confidence_level) / 2 * 100
             upper_percentile = (1 + confidence_level) / 2 * 100
             
             bootstrap_results[metric_name] = {
-                "mean": float(np.mean(values)),
-                "std": float(np.std(values)),
-                "ci_lower": float(np.percentile(bootstrap_samples, lower_percentile)),
-                "ci_upper": float(np.percentile(bootstrap_samples, upper_percentile)),
-                "median": float(np.median(values)),
-                "min": float(np.min(values)),
-                "max": float(np.max(values))
+                "mean": np.mean(values),
+                "std": np.std(values),
+                "ci_lower": np.percentile(bootstrap_samples, lower_percentile),
+                "ci_upper": np.percentile(bootstrap_samples, upper_percentile),
+                "median": np.median(values),
+                "min": np.min(values),
+                "max": np.max(values)
             }
         
         return bootstrap_results
@@ -161,80 +198,83 @@ class AdvancedRAGEvaluator:
         print(f"--- Evaluacion Avanzada RAG | Dataset: {dataset_name.upper()} ---")
         
         # 1. Cargar datos
-        with open(corpus_path, 'r', encoding='utf-8') as f:
-            corpus = [json.loads(line) for line in f]
-        with open(queries_path, 'r', encoding='utf-8') as f:
-            qa_sample = [json.loads(line) for line in f]
+        corpus = load_corpus(corpus_path)
+        qa_sample = load_queries(queries_path)
         corpus_map = {item['_id']: item['text'] for item in corpus}
         
         # 2. Preparar entorno
-        self.reset_rag_system()
-        print(f"Subiendo {len(corpus)} documentos...")
-        api_doc_id_map = {
-            doc['_id']: self.upload_document_from_text(doc['text'], doc['_id'])
-            for doc in tqdm(corpus, desc="Subiendo documentos")
-        }
-        print("Subida completa. Esperando procesamiento...")
-        time.sleep(15)
+        rag_corpus = RAGCorpus(self.api_base_url, corpus)
+        rag_corpus.load(
+            self.reset_rag_system,
+            self.upload_document_from_text,
+            [qa['text'] for qa in qa_sample if qa['_id'] in corpus_map],
+            10
+        )
         
         # 3. Construir dataset de evaluación
         eval_dataset = [
             {
                 "question": qa['text'], 
                 "ideal_answer": corpus_map[qa['_id']], 
-                "expected_doc_id": api_doc_id_map.get(qa['_id'])
+                "expected_doc_id": rag_corpus.document_id(qa['_id'])
             }
             for qa in qa_sample if qa['_id'] in corpus_map
         ]
         
         # 4. Ejecutar evaluación
         detailed_results = []
-        for item in tqdm(eval_dataset, desc="Evaluando consultas"):
-            try:
-                api_response = self.run_query(item['question'])
-                retrieved_chunks = api_response.get('retrieved_chunks', [])
-                retrieved_doc_ids = list(set(chunk['document_id'] for chunk in retrieved_chunks))
+        with shelve.open(METRIC_CACHE_PATH) as self.metric_cache:
+            for item in tqdm(eval_dataset, desc="Evaluando consultas"):
+                try:
+                    api_response, cached = rag_corpus.query(item['question'], 10, self.run_query)
+                    retrieved_chunks = api_response.get('retrieved_chunks', [])
+                    # dict.fromkeys elimina duplicados conservando el orden del ranking
+                    retrieved_doc_ids = list(dict.fromkeys(chunk['document_id'] for chunk in retrieved_chunks))
                 
-                # Métricas de calidad de respuesta
-                quality_metrics = self.calculate_advanced_metrics(
-                    api_response.get('answer', ''), 
-                    item['ideal_answer'], 
-                    item['question']
-                )
+                    # Métricas de calidad de respuesta
+                    quality_metrics = self.calculate_advanced_metrics(
+                        api_response.get('answer', ''), 
+                        item['ideal_answer'], 
+                        item['question']
+                    )
                 
-                # Métricas de recuperación
-                retrieval_metrics = self.calculate_retrieval_metrics(
-                    retrieved_doc_ids, 
-                    item['expected_doc_id']
-                )
+                    # Métricas de recuperación
+                    retrieval_metrics = self.calculate_retrieval_metrics(
+                        retrieved_doc_ids, 
+                        item['expected_doc_id']
+                    )
                 
-                detailed_results.append({
-                    "question": item['question'],
-                    "generated_answer": api_response.get('answer', ''),
-                    "ideal_answer": item['ideal_answer'],
-                    "metrics": {
-                        **quality_metrics,
-                        **retrieval_metrics
-                    },
-                    "retrieval_info": {
-                        "expected_doc_id": item['expected_doc_id'],
-                        "retrieved_doc_ids": retrieved_doc_ids,
-                        "num_retrieved": len(retrieved_doc_ids),
-                        "processing_time": api_response.get('processing_time', 0)
-                    }
-                })
-            except Exception as e:
-                detailed_results.append({
-                    "question": item['question'], 
-                    "error": str(e)
-                })
+                    detailed_results.append({
+                        "question": item['question'],
+                        "generated_answer": api_response.get('answer', ''),
+                        "ideal_answer": item['ideal_answer'],
+                        "metrics": {
+                            **quality_metrics,
+                            **retrieval_metrics
+                        },
+                        "retrieval_info": {
+                            "expected_doc_id": item['expected_doc_id'],
+                            "retrieved_doc_ids": retrieved_doc_ids,
+                            "num_retrieved": len(retrieved_doc_ids),
+                            "processing_time": api_response.get('processing_time', 0),
+                            "cached": cached
+                        }
+                    })
+                except Exception as e:
+                    detailed_results.append({
+                        "question": item['question'], 
+                        "error": str(e)
+                    })
+        
+        # Fuera del bucle las métricas vuelven a memoizarse solo en memoria
+        self.metric_cache = {}
         
         # 5. Calcular estadísticas con bootstraping
         valid_results = [r for r in detailed_results if 'error' not in r]
         
         if not valid_results:
-                    print("No hay resultados validos para analizar")
-        return {}
+            print("No hay resultados validos para analizar")
+            return {}
         
         # Métricas de calidad
         quality_metrics_list = [r['metrics'] for r in valid_results]
@@ -244,14 +284,16 @@ class AdvancedRAGEvaluator:
         avg_metrics = {}
         for metric_name in quality_metrics_list[0].keys():
             values = [result[metric_name] for result in quality_metrics_list]
-            avg_metrics[metric_name] = float(np.mean(values))
+            avg_metrics[metric_name] = np.mean(values)
         
-        # Estadísticas de recuperación
+        # Estadísticas de recuperación; la caché solo vive una ejecución del pipeline, así que el
+        # processing_time de una respuesta cacheada lo midió el servidor en esta misma ejecución
         retrieval_stats = {
             "total_questions": len(valid_results),
             "successful_queries": len([r for r in valid_results if r['retrieval_info']['num_retrieved'] > 0]),
-            "avg_processing_time": float(np.mean([r['retrieval_info']['processing_time'] for r in valid_results])),
-            "avg_retrieved_chunks": float(np.mean([r['retrieval_info']['num_retrieved'] for r in valid_results]))
+            "cached_queries": len([r for r in valid_results if r['retrieval_info']['cached']]),
+            "avg_processing_time": np.mean([r['retrieval_info']['processing_time'] for r in valid_results]),
+            "avg_retrieved_chunks": np.mean([r['retrieval_info']['num_retrieved'] for r in valid_results])
         }
         
         # 6. Generar reporte completo
@@ -275,11 +317,26 @@ class AdvancedRAGEvaluator:
         
         return report
     
-    def save_results(self, report: Dict[str, Any], output_path: str):
-        """Guarda los resultados en formato JSON."""
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(report, f, indent=4, ensure_ascii=False)
+    def save_results(self, report: Dict[str, Any], output_path: str) -> str:
+        """Guarda los resultados en formato JSON, comprimidos con gzip si superan 1MB."""
+        payload = orjson.dumps(report, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+        gzip_path = output_path + '.gz'
+        
+        if len(payload) >= GZIP_THRESHOLD_BYTES:
+            stale_path, output_path = output_path, gzip_path
+            with gzip.open(output_path, 'wb', compresslevel=3) as f:
+                f.write(payload)
+        else:
+            stale_path = gzip_path
+            with open(output_path, 'wb') as f:
+                f.write(payload)
+        
+        # Evitar que quede una versión anterior con la otra extensión
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+        
         print(f"Resultados guardados en: {output_path}")
+        return output_path
     
     def print_summary(self, report: Dict[str, Any]):
         """Imprime un resumen de los resultados."""
@@ -317,7 +374,7 @@ def detect_dataset_name(corpus_path: str) -> str:
     except (FileNotFoundError, json.JSONDecodeError):
         return "fiqa"
 
-def main():
+def main() -> int:
     """Función principal para ejecutar la evaluación avanzada."""
     dataset_name = detect_dataset_name(CORPUS_PATH)
     RESULTS_PATH = f"evaluation/{dataset_name}_advanced_results.json"
@@ -330,15 +387,18 @@ def main():
     
     if report:
         # Guardar resultados
-        evaluator.save_results(report, RESULTS_PATH)
+        saved_path = evaluator.save_results(report, RESULTS_PATH)
         
         # Imprimir resumen
         evaluator.print_summary(report)
         
         print(f"\nEvaluacion completada exitosamente!")
-        print(f"Resultados detallados guardados en: {RESULTS_PATH}")
+        print(f"Resultados detallados guardados en: {saved_path}")
+        return 0
     else:
         print("Error: No se pudo completar la evaluacion")
+        return 1
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main())
+ 
\ No newline at end of file
@@ -4,10 +4,13 @@ Ejemplo de uso de las funcionalidades de evaluación avanzada del sistema RAG.
 Este script demuestra cómo ejecutar evaluaciones y analizar resultados.
 """
 
-import json
+import gzip
 import os
 import sys
 from pathlib import Path
+from typing import Optional
+
+import orjson
 
 def print_header(title: str):
     """Imprime un encabezado formateado."""
@@ -20,15 +23,23 @@ def print_section(title: str):
     print(f"\n🔹 {title}")
     print("-" * 40)
 
+def find_results(file_path: str) -> Optional[str]:
+    """Devuelve la ruta existente del archivo JSON o de su versión comprimida (.json.gz)."""
+    for path in (file_path, file_path + '.gz'):
+        if os.path.exists(path):
+            return path
+    return None
+
 def load_results(file_path: str) -> dict:
-    """Carga resultados desde un archivo JSON."""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
+    """Carga resultados desde un archivo JSON, comprimido con gzip o no."""
+    path = find_results(file_path)
+    if path is None:
         print(f"❌ Archivo no encontrado: {file_path}")
         return {}
-    except json.JSONDecodeError:
+    try:
+        with (gzip.open if path.endswith('.gz') else open)(path, 'rb') as f:
+            return orjson.loads(f.read())
+    except orjson.JSONDecodeError:
         print(f"❌ Error al parsear JSON: {file_path}")
         return {}
 
@@ -82,7 +93,8 @@ def analyze_advanced_results():
         print(f"  - Estadísticas de recuperación:")
         print(f"    * Total preguntas: {retrieval_stats.get('total_questions', 0)}")
         print(f"    * Consultas exitosas: {retrieval_stats.get('successful_queries', 0)}")
-        print(f"    * Tiempo promedio: {retrieval_stats.get('avg_processing_time', 0):.3f}s")
+        avg_processing_time = retrieval_stats.get('avg_processing_time')
+        print(f"    * Tiempo promedio: {'n/d' if avg_processing_time is None else f'{avg_processing_time:.3f}s'}")
         
         # Mostrar intervalos de confianza
         bootstrap_intervals = fiqa_advanced.get('bootstrap_confidence_intervals', {})
@@ -102,7 +114,8 @@ def analyze_advanced_results():
         print(f"  - Estadísticas de recuperación:")
         print(f"    * Total preguntas: {retrieval_stats.get('total_questions', 0)}")
         print(f"    * Consultas exitosas: {retrieval_stats.get('successful_queries', 0)}")
-        print(f"    * Tiempo promedio: {retrieval_stats.get('avg_processing_time', 0):.3f}s")
+        avg_processing_time = retrieval_stats.get('avg_processing_time')
+        print(f"    * Tiempo promedio: {'n/d' if avg_processing_time is None else f'{avg_processing_time:.3f}s'}")
         
         # Mostrar intervalos de confianza
         bootstrap_intervals = squad_advanced.get('bootstrap_confidence_intervals', {})
@@ -183,12 +196,12 @@ def main():
     # Analizar resultados si existen
     print_section("Análisis de Resultados Existentes")
     
-    if any(os.path.exists(f) for f in ["fiqa_results.json", "squad_es_results.json"]):
+    if any(find_results(f) for f in ["fiqa_results.json", "squad_es_results.json"]):
         analyze_basic_results()
     else:
         print("Advertencia: No se encontraron resultados basicos. Ejecuta primero las evaluaciones.")
     
-    if any(os.path.exists(f) for f in ["fiqa_advanced_results.json", "squad_es_advanced_results.json"]):
+    if any(find_results(f) for f in ["fiqa_advanced_results.json", "squad_es_advanced_results.json"]):
         analyze_advanced_results()
     else:
         print("Advertencia: No se encontraron resultados avanzados. Ejecuta primero las evaluaciones avanzadas.")
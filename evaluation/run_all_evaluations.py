@@ -4,166 +4,360 @@ Script para ejecutar todas las evaluaciones del sistema RAG de manera automatiza
 Incluye evaluación básica, avanzada y generación de reportes.
 """
 
+import argparse
+import asyncio
+import functools
+import glob
+import importlib
+import multiprocessing
 import os
 import sys
-import subprocess
 import time
-from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set
 
-def run_command(command: str, description: str) -> bool:
-    """Ejecuta un comando y maneja errores."""
-    print(f"\n🔄 {description}")
-    print(f"Comando: {command}")
-    print("-" * 50)
+import urllib3
+
+from _data_cache import load_corpus, load_queries
+from _rag_cache import start_run
+
+RAW_DATA_DIR = "evaluation/raw_data"
+CORPUS_PATH = os.path.join(RAW_DATA_DIR, "corpus.json")
+QUERIES_SAMPLE_PATH = os.path.join(RAW_DATA_DIR, "queries_sample.json")
+HEALTH_URL = "http://localhost:8000/api/v1/health/"
+# Resultados de la evaluación básica, que son a su vez la entrada del reporte básico
+BASIC_RESULTS = ["evaluation/fiqa_results.json", "evaluation/squad_es_results.json"]
+
+# Límites para que un servidor RAG colgado no deje el pipeline esperando indefinidamente
+TIMEOUT_PER_STEP = int(os.environ.get("EVAL_STEP_TIMEOUT", "3600"))
+TOTAL_BUDGET = int(os.environ.get("EVAL_TOTAL_BUDGET", "10800"))
+
+# fork solo en Linux (spawn/forkserver son allí el defecto desde Python 3.14): así los hijos
+# heredan los datos que el padre precarga en _data_cache. En macOS fork no es seguro (p. ej.
+# la consulta de proxies del sistema que hace requests), así que se usa el método por defecto
+# y cada hijo carga los datos por su cuenta.
+_mp_context = multiprocessing.get_context("fork" if sys.platform.startswith("linux") else None)
+JOIN_POLL_INTERVAL = 0.2
+
+# Pool compartido con reintentos acotados para que un fallo transitorio no aborte todo
+_http = urllib3.PoolManager(
+    maxsize=4,
+    retries=urllib3.Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+)
+
+@functools.lru_cache(maxsize=1)
+def list_raw_data(_epoch: int = 0) -> frozenset:
+    """Lista los ficheros de RAW_DATA_DIR con un único scandir, memoizado por `_epoch`."""
+    try:
+        with os.scandir(RAW_DATA_DIR) as entries:
+            return frozenset(entry.name for entry in entries if entry.is_file())
+    except FileNotFoundError:
+        return frozenset()
+
+def _run_script_main(module_name: str, argv: Optional[List[str]]) -> None:
+    """Punto de entrada del proceso hijo: importa el script y sale con el código de su main()."""
+    module = importlib.import_module(module_name)
+    sys.exit(module.main() if argv is None else module.main(argv))
+
+async def _wait_process(process: multiprocessing.process.BaseProcess, timeout: Optional[float]) -> None:
+    """Espera a que termine `process`, como mucho `timeout` segundos, sin bloquear el bucle.
+    
+    Se sondea desde el propio bucle en lugar de usar asyncio.to_thread: hacer fork con
+    otros hilos vivos puede dejar en el hijo locks tomados que nadie liberará.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while process.is_alive() and (deadline is None or time.monotonic() < deadline):
+        await asyncio.sleep(JOIN_POLL_INTERVAL)
+
+async def run_in_worker(
+    module_name: str,
+    description: str,
+    argv: Optional[List[str]] = None,
+    timeout: Optional[float] = None
+) -> bool:
+    """Ejecuta el main() de un script en un proceso hijo propio y maneja errores.
+    
+    Cada paso ocupa su propio núcleo, de modo que un reporte (CPU) no compite por el GIL
+    con la evaluación que corre en paralelo. En Linux el hijo se crea con fork y hereda
+    el corpus y las consultas precargados por el padre; el script del paso se importa en el hijo.
+    Si el paso supera `timeout` segundos, el proceso hijo se termina y el paso se da por
+    fallido.
+    """
+    # Una sola escritura: la cabecera debe salir antes de que el hijo empiece a escribir
+    print(f"\n🔄 {description}\n{'-' * 50}")
     
     try:
-        result = subprocess.run(
-            command, 
-            shell=True, 
-            capture_output=True, 
-            text=True, 
-            cwd=Path(__file__).parent
-        )
-        
-        if result.returncode == 0:
-            print(f"✅ {description} completado exitosamente")
-            if result.stdout:
-                print("Salida:", result.stdout)
-            return True
-        else:
-            print(f"❌ Error en {description}")
-            print("Error:", result.stderr)
+        process = _mp_context.Process(target=_run_script_main, args=(module_name, argv), name=module_name)
+        process.start()
+        await _wait_process(process, timeout)
+        if process.is_alive():
+            print(f"❌ {description} supero el tiempo limite de {timeout:.1f}s; deteniendolo")
+            process.terminate()
+            await _wait_process(process, 5)
+            if process.is_alive():
+                process.kill()
+                await _wait_process(process, None)
             return False
-            
     except Exception as e:
         print(f"❌ Excepción en {description}: {e}")
         return False
+    
+    # Las excepciones no capturadas del hijo ya se imprimieron y terminan con código 1
+    exit_code = process.exitcode
+    if exit_code == 0:
+        print(f"✅ {description} completado exitosamente")
+        return True
+    else:
+        print(f"❌ Error en {description} (codigo de salida {exit_code})")
+        return False
 
-def check_prerequisites() -> bool:
-    """Verifica que los prerrequisitos estén cumplidos."""
+@functools.lru_cache(maxsize=1)
+def check_prerequisites(_epoch: int = 0) -> bool:
+    """Verifica que los prerrequisitos estén cumplidos.
+    
+    El resultado se memoiza por `_epoch`: pasar 0 lo fija para todo el proceso y,
+    p. ej., int(time.time() // 30) lo revalida cada 30 segundos.
+    """
     print("🔍 Verificando prerrequisitos...")
     
     # Verificar que el servidor RAG esté ejecutándose
     try:
-        import requests
-        response = requests.get("http://localhost:8000/api/v1/health/", timeout=5)
-        if response.status_code == 200:
+        response = _http.request("GET", HEALTH_URL, timeout=urllib3.Timeout(connect=2, read=5))
+        if response.status == 200:
             print("Servidor RAG esta ejecutandose")
         else:
             print("Servidor RAG no responde correctamente")
             return False
-    except Exception as e:
+    except urllib3.exceptions.HTTPError as e:
         print(f"No se puede conectar al servidor RAG: {e}")
         print("Asegurate de que el servidor este ejecutandose en http://localhost:8000")
         return False
     
     # Verificar archivos de datos
-    data_files = [
-        "evaluation/raw_data/corpus.json",
-        "evaluation/raw_data/queries_sample.json"
-    ]
-    
-    for file_path in data_files:
-        if not os.path.exists(file_path):
-            print(f"Archivo de datos no encontrado: {file_path}")
-            return False
+    data_files = [CORPUS_PATH, QUERIES_SAMPLE_PATH]
+    
+    available = list_raw_data(_epoch)
+    missing = next((file_path for file_path in data_files if os.path.basename(file_path) not in available), None)
+    if missing:
+        print(f"Archivo de datos no encontrado: {missing}")
+        return False
     
     print("Todos los prerrequisitos cumplidos")
     return True
 
-def run_basic_evaluation() -> bool:
+async def run_basic_evaluation(timeout: Optional[float] = None) -> bool:
     """Ejecuta la evaluación básica."""
-    return run_command(
-        "python evaluate.py",
-        "Ejecutando evaluación básica"
+    return await run_in_worker(
+        "evaluate",
+        "Ejecutando evaluación básica",
+        timeout=timeout
     )
 
-def run_advanced_evaluation() -> bool:
+async def run_advanced_evaluation(timeout: Optional[float] = None) -> bool:
     """Ejecuta la evaluación avanzada con bootstraping."""
-    return run_command(
-        "python evaluate_advanced.py",
-        "Ejecutando evaluación avanzada con bootstraping"
+    return await run_in_worker(
+        "evaluate_advanced",
+        "Ejecutando evaluación avanzada con bootstraping",
+        timeout=timeout
     )
 
-def generate_basic_report() -> bool:
+async def generate_basic_report(timeout: Optional[float] = None) -> bool:
     """Genera el reporte básico."""
-    return run_command(
-        "python visualize_metrics.py",
-        "Generando reporte básico de métricas"
+    # argv vacío para que el script no interprete los argumentos de este proceso
+    return await run_in_worker(
+        "visualize_metrics",
+        "Generando reporte básico de métricas",
+        argv=[],
+        timeout=timeout
     )
 
-def generate_advanced_report() -> bool:
+async def generate_advanced_report(timeout: Optional[float] = None) -> bool:
     """Genera el reporte avanzado."""
-    return run_command(
-        "python visualize_advanced_metrics.py",
-        "Generando reporte avanzado con intervalos de confianza"
+    return await run_in_worker(
+        "visualize_advanced_metrics",
+        "Generando reporte avanzado con intervalos de confianza",
+        argv=[],
+        timeout=timeout
     )
 
 def print_summary(results: Dict[str, bool]):
-    """Imprime un resumen de los resultados."""
-    print("\n" + "="*60)
-    print("RESUMEN DE EVALUACIONES")
-    print("="*60)
+    """Imprime un resumen de los resultados con una única escritura."""
+    lines = ["", "="*60, "RESUMEN DE EVALUACIONES", "="*60]
     
     for step, success in results.items():
         status = "EXITOSO" if success else "FALLIDO"
-        print(f"{step}: {status}")
+        lines.append(f"{step}: {status}")
     
     successful_steps = sum(results.values())
     total_steps = len(results)
     
-    print(f"\nResultado: {successful_steps}/{total_steps} pasos exitosos")
+    lines.append(f"\nResultado: {successful_steps}/{total_steps} pasos exitosos")
     
     if successful_steps == total_steps:
-        print("Todas las evaluaciones completadas exitosamente!")
-        print("\nArchivos generados:")
-        print("  - evaluation/fiqa_results.json")
-        print("  - evaluation/squad_es_results.json")
-        print("  - evaluation/fiqa_advanced_results.json")
-        print("  - evaluation/squad_es_advanced_results.json")
-        print("  - evaluation/evaluation_report.html")
-        print("  - evaluation/advanced_evaluation_report.html")
+        # Rutas reales: los resultados avanzados grandes se guardan como .json.gz
+        generated = sorted(
+            path
+            for step_name, _, _, outputs in STEPS.values() if step_name in results
+            for pattern in outputs
+            for path in glob.glob(pattern)
+        )
+        lines += ["Todas las evaluaciones completadas exitosamente!", "\nArchivos generados:"]
+        lines += [f"  - {path}" for path in generated]
     else:
-        print("Algunas evaluaciones fallaron. Revisa los errores arriba.")
+        lines.append("Algunas evaluaciones fallaron. Revisa los errores arriba.")
+    
+    print("\n".join(lines))
 
-def main():
-    """Función principal para ejecutar todas las evaluaciones."""
-    print("Iniciando evaluacion completa del sistema RAG")
-    print("="*60)
-    
-    # Verificar prerrequisitos
-    if not check_prerequisites():
-        print("Error: Los prerrequisitos no se cumplen. Abortando.")
-        sys.exit(1)
-    
-    # Lista de pasos a ejecutar
-    steps = [
-        ("Evaluación Básica", run_basic_evaluation),
-        ("Evaluación Avanzada", run_advanced_evaluation),
-        ("Reporte Básico", generate_basic_report),
-        ("Reporte Avanzado", generate_advanced_report)
-    ]
+# Pasos del pipeline: clave de CLI -> (nombre, función, entradas, salidas).
+# Entradas y salidas son patrones glob relativos al directorio de trabajo, usados por --resume.
+STEPS = {
+    "basic": (
+        "Evaluación Básica", run_basic_evaluation,
+        [CORPUS_PATH, QUERIES_SAMPLE_PATH], BASIC_RESULTS
+    ),
+    "adv": (
+        "Evaluación Avanzada", run_advanced_evaluation,
+        [CORPUS_PATH, QUERIES_SAMPLE_PATH], ["evaluation/*_advanced_results.json*"]
+    ),
+    "basic_report": (
+        "Reporte Básico", generate_basic_report,
+        BASIC_RESULTS, ["evaluation/evaluation_report.html"]
+    ),
+    "adv_report": (
+        "Reporte Avanzado", generate_advanced_report,
+        ["evaluation/*_advanced_results.json*"], ["evaluation/advanced_evaluation_report.html"]
+    ),
+}
+
+def is_up_to_date(inputs: List[str], outputs: List[str]) -> bool:
+    """Indica si las salidas existen y son más recientes que todas las entradas."""
+    output_files = [path for pattern in outputs for path in glob.glob(pattern)]
+    if not output_files:
+        return False
+    input_files = [path for pattern in inputs for path in glob.glob(pattern)]
+    newest_input = max((os.path.getmtime(path) for path in input_files), default=0.0)
+    return min(os.path.getmtime(path) for path in output_files) >= newest_input
+
+async def run_pipelines(selected: Set[str], resume: bool = False) -> Dict[str, bool]:
+    """Ejecuta los pasos seleccionados como etapas enlazadas por eventos.
     
+    basic_eval ─┬─> basic_report
+                └─> advanced_eval ──> advanced_report
+    
+    Ambas evaluaciones reinician y recargan la base del mismo servidor RAG, así que la
+    avanzada espera a que termine la básica; el reporte básico se genera mientras tanto.
+    Los pasos no seleccionados se omiten sin bloquear a los siguientes. Con `resume`,
+    cada paso comprueba si está al día justo antes de ejecutarse, una vez que los pasos
+    previos han regenerado sus entradas.
+    """
     results = {}
+    basic_done = asyncio.Event()
+    deadline = time.monotonic() + TOTAL_BUDGET
     
-    # Ejecutar cada paso
-    for step_name, step_function in steps:
-        success = step_function()
-        results[step_name] = success
+    async def run_step(step_key: str) -> bool:
+        if step_key not in selected:
+            return True
+        
+        step_name, step_function, inputs, outputs = STEPS[step_key]
+        if resume and is_up_to_date(inputs, outputs):
+            print(f"Paso '{step_name}' al dia, se omite (--resume)")
+            return True
         
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            print(f"Advertencia: Presupuesto total de {TOTAL_BUDGET}s agotado, se omite '{step_name}'")
+            results[step_name] = False
+            return False
+        
+        success = await step_function(timeout=min(TIMEOUT_PER_STEP, remaining))
+        results[step_name] = success
         if not success:
             print(f"Advertencia: El paso '{step_name}' fallo, pero continuando con los siguientes...")
+        return success
+    
+    async def basic_evaluation_stage():
+        try:
+            await run_step("basic")
+        finally:
+            basic_done.set()
+    
+    async def basic_report_stage():
+        await basic_done.wait()
+        await run_step("basic_report")
+    
+    async def advanced_stage():
+        await basic_done.wait()
+        await run_step("adv")
+        await run_step("adv_report")
+    
+    await asyncio.gather(basic_evaluation_stage(), basic_report_stage(), advanced_stage())
+    
+    # Mantener el orden original de los pasos en el resumen
+    step_order = [step_name for step_name, *_ in STEPS.values()]
+    return {step_name: results[step_name] for step_name in step_order if step_name in results}
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Interpreta los argumentos de línea de comandos."""
+    parser = argparse.ArgumentParser(description="Ejecuta las evaluaciones del sistema RAG y genera sus reportes.")
+    parser.add_argument("--only", nargs="+", choices=list(STEPS), help="Ejecuta solo estos pasos.")
+    parser.add_argument("--skip", nargs="+", choices=list(STEPS), default=[], help="Omite estos pasos.")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Omite los pasos cuyas salidas ya existen y son más recientes que sus entradas."
+    )
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
+    """Función principal para ejecutar todas las evaluaciones."""
+    args = parse_args(argv)
+    
+    # Los pasos escriben directamente en nuestra salida; con stdout redirigido (p. ej. en CI)
+    # el buffer por bloques retrasaría el progreso hasta el final de cada paso.
+    sys.stdout.reconfigure(line_buffering=True)
+    
+    print(f"Iniciando evaluacion completa del sistema RAG\n{'='*60}")
+    
+    selected = set(args.only or STEPS) - set(args.skip)
+    if not selected:
+        print("No hay pasos por ejecutar.")
+        return
+    
+    # Solo las evaluaciones necesitan el servidor RAG y los datos de entrada; sus entradas
+    # no las genera ningún paso, así que con --resume puede saberse ya si se ejecutarán
+    evaluations = {
+        key for key in selected & {"basic", "adv"}
+        if not (args.resume and is_up_to_date(*STEPS[key][2:]))
+    }
+    if evaluations:
+        # Verificar prerrequisitos
+        if not check_prerequisites(0):
+            print("Error: Los prerrequisitos no se cumplen. Abortando.")
+            sys.exit(1)
+        
+        # Precargar los datos para que ambas evaluaciones compartan un único parseo (solo los hereda fork)
+        if _mp_context.get_start_method() == "fork":
+            load_corpus(CORPUS_PATH)
+            load_queries(QUERIES_SAMPLE_PATH)
+        
+        # Las evaluaciones de esta ejecución comparten respuestas; las de ejecuciones anteriores se descartan
+        start_run()
+    
+    results = asyncio.run(run_pipelines(selected, resume=args.resume))
+    if not results:
+        print("No hay pasos por ejecutar.")
+        return
     
     # Imprimir resumen
     print_summary(results)
     
     # Sugerir próximos pasos
-    print("\nProximos pasos sugeridos:")
-    print("1. Revisar los reportes HTML generados")
-    print("2. Analizar los intervalos de confianza")
-    print("3. Comparar metricas entre datasets")
-    print("4. Ajustar parametros del sistema segun los resultados")
+    print(
+        "\nProximos pasos sugeridos:\n"
+        "1. Revisar los reportes HTML generados\n"
+        "2. Analizar los intervalos de confianza\n"
+        "3. Comparar metricas entre datasets\n"
+        "4. Ajustar parametros del sistema segun los resultados"
+    )
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -1,370 +1,80 @@
-import json
+import functools
+import gzip
+import itertools
 import os
+import shelve
+import string
+import sys
 import webbrowser
 import argparse
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import plotly.express as px
-import pandas as pd
-import numpy as np
-from typing import Dict, List, Any
-
-def load_advanced_results(base_dir: str) -> Dict[str, Any]:
-    """Carga los resultados avanzados de evaluación."""
-    datasets = {}
-    
-    # Buscar archivos de resultados avanzados
-    dataset_names = ["fiqa", "squad_es"]
-    
-    for name in dataset_names:
-        advanced_path = os.path.join(base_dir, f"{name}_advanced_results.json")
-        
-        if os.path.exists(advanced_path):
-            with open(advanced_path, "r", encoding="utf-8") as f:
-                datasets[name] = json.load(f)
-        else:
-            print(f"Advertencia: No se encontro el archivo de resultados avanzados para {name}")
-    
-    return datasets
-
-def create_metrics_comparison_chart(datasets: Dict[str, Any]) -> go.Figure:
-    """Crea un gráfico comparativo de métricas con intervalos de confianza."""
-    if not datasets:
-        return None
-    
-    # Preparar datos para el gráfico
-    metrics_data = []
-    
-    for dataset_name, data in datasets.items():
-        if 'bootstrap_confidence_intervals' not in data:
-            continue
-            
-        for metric_name, stats in data['bootstrap_confidence_intervals'].items():
-            metrics_data.append({
-                'Dataset': dataset_name.upper(),
-                'Metric': metric_name,
-                'Mean': stats['mean'],
-                'CI_Lower': stats['ci_lower'],
-                'CI_Upper': stats['ci_upper'],
-                'Std': stats['std']
-            })
-    
-    if not metrics_data:
-        return None
-    
-    df = pd.DataFrame(metrics_data)
-    
-    # Crear gráfico con barras y intervalos de confianza
-    fig = go.Figure()
-    
-    colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd']
-    
-    for i, dataset in enumerate(df['Dataset'].unique()):
-        dataset_data = df[df['Dataset'] == dataset]
-        
-        fig.add_trace(go.Bar(
-            name=dataset,
-            x=dataset_data['Metric'],
-            y=dataset_data['Mean'],
-            error_y=dict(
-                type='data',
-                array=dataset_data['Std'],
-                visible=True
-            ),
-            marker_color=colors[i % len(colors)],
-            text=[f"{val:.3f}" for val in dataset_data['Mean']],
-            textposition='auto',
-            hovertemplate='<b>%{x}</b><br>' +
-                         'Mean: %{y:.4f}<br>' +
-                         'Std: %{customdata:.4f}<br>' +
-                         'CI: [%{customdata[1]:.4f}, %{customdata[2]:.4f}]<br>' +
-                         '<extra></extra>',
-            customdata=dataset_data[['Std', 'CI_Lower', 'CI_Upper']].values
-        ))
-    
-    fig.update_layout(
-        title="Comparacion de Metricas con Intervalos de Confianza (95%)",
-        title_x=0.5,
-        title_font_size=20,
-        xaxis_title="Metricas",
-        yaxis_title="Puntuacion",
-        barmode='group',
-        height=600,
-        showlegend=True,
-        font_family="Arial, sans-serif",
-        plot_bgcolor='rgba(240, 240, 240, 0.95)',
-        paper_bgcolor='white',
-    )
-    
-    return fig
-
-def create_confidence_intervals_chart(datasets: Dict[str, Any]) -> go.Figure:
-    """Crea un gráfico específico para intervalos de confianza."""
-    if not datasets:
-        return None
-    
-    fig = go.Figure()
-    
-    colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd']
-    
-    for i, (dataset_name, data) in enumerate(datasets.items()):
-        if 'bootstrap_confidence_intervals' not in data:
-            continue
-            
-        for j, (metric_name, stats) in enumerate(data['bootstrap_confidence_intervals'].items()):
-            fig.add_trace(go.Scatter(
-                x=[f"{dataset_name.upper()}_{metric_name}"],
-                y=[stats['mean']],
-                error_y=dict(
-                    type='data',
-                    array=[stats['mean'] - stats['ci_lower']],
-                    arrayminus=[stats['ci_upper'] - stats['mean']],
-                    visible=True
-                ),
-                mode='markers+text',
-                name=f"{dataset_name.upper()} - {metric_name}",
-                marker=dict(
-                    size=10,
-                    color=colors[i % len(colors)]
-                ),
-                text=[f"{stats['mean']:.3f}"],
-                textposition='top center',
-                hovertemplate='<b>%{x}</b><br>' +
-                             'Mean: %{y:.4f}<br>' +
-                             'CI: [%{customdata[0]:.4f}, %{customdata[1]:.4f}]<br>' +
-                             '<extra></extra>',
-                customdata=[[stats['ci_lower'], stats['ci_upper']]]
-            ))
-    
-    fig.update_layout(
-        title="Intervalos de Confianza por Metrica y Dataset",
-        title_x=0.5,
-        title_font_size=20,
-        xaxis_title="Dataset_Metrica",
-        yaxis_title="Puntuacion",
-        height=800,
-        showlegend=False,
-        font_family="Arial, sans-serif",
-        plot_bgcolor='rgba(240, 240, 240, 0.95)',
-        paper_bgcolor='white',
-    )
-    
-    return fig
-
-def create_retrieval_metrics_chart(datasets: Dict[str, Any]) -> go.Figure:
-    """Crea un gráfico específico para métricas de recuperación."""
-    if not datasets:
-        return None
-    
-    fig = go.Figure()
-    
-    colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd']
-    
-    for i, (dataset_name, data) in enumerate(datasets.items()):
-        if 'summary_statistics' not in data:
-            continue
-            
-        # Extraer métricas de recuperación
-        retrieval_metrics = {}
-        for metric_name, value in data['summary_statistics']['average_metrics'].items():
-            if 'hit_rate_at_' in metric_name:
-                retrieval_metrics[metric_name] = value
-        
-        if retrieval_metrics:
-            x_values = list(retrieval_metrics.keys())
-            y_values = list(retrieval_metrics.values())
-            
-            fig.add_trace(go.Scatter(
-                x=x_values,
-                y=y_values,
-                mode='lines+markers',
-                name=dataset_name.upper(),
-                marker=dict(
-                    size=8,
-                    color=colors[i % len(colors)]
-                ),
-                line=dict(width=3),
-                hovertemplate='<b>%{x}</b><br>' +
-                             'Hit Rate: %{y:.3f}<br>' +
-                             '<extra></extra>'
-            ))
-    
-    fig.update_layout(
-        title="Metricas de Recuperacion por Dataset",
-        title_x=0.5,
-        title_font_size=20,
-        xaxis_title="K (Numero de resultados)",
-        yaxis_title="Hit Rate",
-        height=500,
-        showlegend=True,
-        font_family="Arial, sans-serif",
-        plot_bgcolor='rgba(240, 240, 240, 0.95)',
-        paper_bgcolor='white',
-    )
-    
-    return fig
-
-def create_performance_dashboard(datasets: Dict[str, Any]) -> go.Figure:
-    """Crea un dashboard de rendimiento del sistema."""
-    if not datasets:
-        return None
-    
-    # Crear subplots
-    fig = make_subplots(
-        rows=2, cols=2,
-        subplot_titles=[
-            "Tiempo de Procesamiento",
-            "Chunks Recuperados",
-            "Tasa de Éxito de Consultas",
-            "Estadísticas Generales"
-        ],
-        specs=[[{"type": "bar"}, {"type": "bar"}],
-                   [{"type": "indicator"}, {"type": "table"}]]
-    )
-    
-    colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd']
-    
-    for i, (dataset_name, data) in enumerate(datasets.items()):
-        if 'summary_statistics' not in data:
-            continue
-            
-        stats = data['summary_statistics']['retrieval_statistics']
-        
-        # Tiempo de procesamiento
-        fig.add_trace(
-            go.Bar(
-                x=[dataset_name.upper()],
-                y=[stats.get('avg_processing_time', 0)],
-                name=f"Tiempo - {dataset_name.upper()}",
-                marker_color=colors[i % len(colors)],
-                showlegend=False
-            ),
-            row=1, col=1
-        )
-        
-        # Chunks recuperados
-        fig.add_trace(
-            go.Bar(
-                x=[dataset_name.upper()],
-                y=[stats.get('avg_retrieved_chunks', 0)],
-                name=f"Chunks - {dataset_name.upper()}",
-                marker_color=colors[i % len(colors)],
-                showlegend=False
-            ),
-            row=1, col=2
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import blake2b
+import orjson
+from typing import TYPE_CHECKING, Dict, List, Any, Tuple
+
+# plotly, pandas y numpy se importan dentro de las funciones que los usan para que
+# --help y las salidas tempranas por falta de resultados no paguen su importación
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+CHART_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".chart_cache")
+CHARTS_VERSION = 3  # Incrementar al cambiar cualquier gráfico para invalidar la caché
+
+# Partes constantes de las trazas, compartidas por todas las llamadas
+_COLORS = ('#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd')
+_ERROR_Y_BASE = {'type': 'data', 'visible': True}
+_CI_MARKER_BASE = {'size': 10}
+_HIT_RATE_MARKER_BASE = {'size': 8}
+_HIT_RATE_LINE = {'width': 3}
+_HOVER_METRICS = (
+    '<b>%{x}</b><br>'
+    'Mean: %{y:.4f}<br>'
+    'Std: %{customdata:.4f}<br>'
+    'CI: [%{customdata[1]:.4f}, %{customdata[2]:.4f}]<br>'
+    '<extra></extra>'
+)
+_HOVER_CI = (
+    '<b>%{x}</b><br>'
+    'Mean: %{y:.4f}<br>'
+    'CI: [%{customdata[0]:.4f}, %{customdata[1]:.4f}]<br>'
+    '<extra></extra>'
+)
+_HOVER_HIT_RATE = '<b>%{x}</b><br>Hit Rate: %{y:.3f}<br><extra></extra>'
+
+# Rejilla fija 2x2 del dashboard, con los mismos dominios y títulos que generaría make_subplots
+_DASHBOARD_TOP_ROW = [0.625, 1.0]
+_DASHBOARD_BOTTOM_ROW = [0.0, 0.375]
+_DASHBOARD_LEFT_COL = [0.0, 0.45]
+_DASHBOARD_RIGHT_COL = [0.55, 1.0]
+_DASHBOARD_LAYOUT = {
+    'xaxis': {'anchor': 'y', 'domain': _DASHBOARD_LEFT_COL},
+    'yaxis': {'anchor': 'x', 'domain': _DASHBOARD_TOP_ROW},
+    'xaxis2': {'anchor': 'y2', 'domain': _DASHBOARD_RIGHT_COL},
+    'yaxis2': {'anchor': 'x2', 'domain': _DASHBOARD_TOP_ROW},
+    'annotations': [
+        {
+            'text': text,
+            'x': sum(col) / 2,
+            'y': row[1],
+            'xref': 'paper',
+            'yref': 'paper',
+            'xanchor': 'center',
+            'yanchor': 'bottom',
+            'showarrow': False,
+            'font': {'size': 16},
+        }
+        for text, row, col in (
+            ("Tiempo de Procesamiento", _DASHBOARD_TOP_ROW, _DASHBOARD_LEFT_COL),
+            ("Chunks Recuperados", _DASHBOARD_TOP_ROW, _DASHBOARD_RIGHT_COL),
+            ("Tasa de Éxito de Consultas", _DASHBOARD_BOTTOM_ROW, _DASHBOARD_LEFT_COL),
+            ("Estadísticas Generales", _DASHBOARD_BOTTOM_ROW, _DASHBOARD_RIGHT_COL),
         )
-        
-        # Tasa de éxito
-        success_rate = stats.get('successful_queries', 0) / max(stats.get('total_questions', 1), 1)
-        fig.add_trace(
-            go.Indicator(
-                mode="gauge+number+delta",
-                value=success_rate * 100,
-                domain={'x': [0, 1], 'y': [0, 1]},
-                title={'text': f"Éxito {dataset_name.upper()}"},
-                gauge={
-                    'axis': {'range': [None, 100]},
-                    'bar': {'color': colors[i % len(colors)]},
-                    'steps': [
-                        {'range': [0, 50], 'color': "lightgray"},
-                        {'range': [50, 80], 'color': "gray"},
-                        {'range': [80, 100], 'color': "darkgray"}
-                    ],
-                    'threshold': {
-                        'line': {'color': "red", 'width': 4},
-                        'thickness': 0.75,
-                        'value': 90
-                    }
-                }
-            ),
-            row=2, col=1
-        )
-    
-    # Tabla de estadísticas
-    table_data = []
-    for dataset_name, data in datasets.items():
-        if 'summary_statistics' in data:
-            stats = data['summary_statistics']['retrieval_statistics']
-            table_data.append([
-                dataset_name.upper(),
-                stats.get('total_questions', 0),
-                stats.get('successful_queries', 0),
-                f"{stats.get('avg_processing_time', 0):.3f}s",
-                f"{stats.get('avg_retrieved_chunks', 0):.1f}"
-            ])
-    
-    if table_data:
-        fig.add_trace(
-            go.Table(
-                header=dict(
-                    values=['Dataset', 'Total Q', 'Éxitos', 'Tiempo Prom', 'Chunks Prom'],
-                    fill_color='paleturquoise',
-                    align='left'
-                ),
-                cells=dict(
-                    values=list(zip(*table_data)),
-                    fill_color='lavender',
-                    align='left'
-                )
-            ),
-            row=2, col=2
-        )
-    
-    fig.update_layout(
-        title="Dashboard de Rendimiento del Sistema RAG",
-        title_x=0.5,
-        title_font_size=20,
-        height=800,
-        showlegend=False,
-        font_family="Arial, sans-serif",
-        plot_bgcolor='rgba(240, 240, 240, 0.95)',
-        paper_bgcolor='white',
-    )
-    
-    return fig
+    ],
+}
 
-def generate_advanced_report(datasets: Dict[str, Any], output_path: str) -> str:
-    """Genera un informe HTML avanzado con múltiples visualizaciones."""
-    if not datasets:
-        return None
-    
-    # Crear todas las visualizaciones
-    charts = []
-    
-    # 1. Comparación de métricas
-    metrics_chart = create_metrics_comparison_chart(datasets)
-    if metrics_chart:
-        charts.append(("Comparación de Métricas", metrics_chart))
-    
-    # 2. Intervalos de confianza
-    ci_chart = create_confidence_intervals_chart(datasets)
-    if ci_chart:
-        charts.append(("Intervalos de Confianza", ci_chart))
-    
-    # 3. Métricas de recuperación
-    retrieval_chart = create_retrieval_metrics_chart(datasets)
-    if retrieval_chart:
-        charts.append(("Métricas de Recuperación", retrieval_chart))
-    
-    # 4. Dashboard de rendimiento
-    performance_chart = create_performance_dashboard(datasets)
-    if performance_chart:
-        charts.append(("Dashboard de Rendimiento", performance_chart))
-    
-    if not charts:
-        return None
-    
-    # Crear HTML con todas las visualizaciones
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="es">
-    <head>
-        <meta charset="utf-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1">
-        <title>Informe Avanzado de Evaluacion RAG</title>
-        <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap" rel="stylesheet">
-        <style>
-            :root {{
+# Hoja de estilos del informe; se inserta tal cual en el <head>
+_CSS_TEMPLATE = """
+            :root {
                 --primary-color: #2563eb;
                 --secondary-color: #64748b;
                 --success-color: #10b981;
@@ -378,28 +88,28 @@ def generate_advanced_report(datasets: Dict[str, Any], output_path: str) -> str:
                 --shadow-sm: 0 1px 2px 0 rgb(0 0 0 / 0.05);
                 --shadow-md: 0 4px 6px -1px rgb(0 0 0 / 0.1), 0 2px 4px -2px rgb(0 0 0 / 0.1);
                 --shadow-lg: 0 10px 15px -3px rgb(0 0 0 / 0.1), 0 4px 6px -4px rgb(0 0 0 / 0.1);
-            }}
+            }
 
-            * {{
+            * {
                 margin: 0;
                 padding: 0;
                 box-sizing: border-box;
-            }}
+            }
 
-            body {{
+            body {
                 font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
                 background-color: var(--background-color);
                 color: var(--text-primary);
                 line-height: 1.6;
-            }}
+            }
 
-            .container {{
+            .container {
                 max-width: 1400px;
                 margin: 0 auto;
                 padding: 2rem;
-            }}
+            }
 
-            .header {{
+            .header {
                 background: linear-gradient(135deg, var(--primary-color) 0%, #1d4ed8 100%);
                 color: white;
                 padding: 3rem 2rem;
@@ -407,30 +117,30 @@ def generate_advanced_report(datasets: Dict[str, Any], output_path: str) -> str:
                 margin-bottom: 2rem;
                 text-align: center;
                 box-shadow: var(--shadow-lg);
-            }}
+            }
 
-            .header h1 {{
+            .header h1 {
                 font-size: 2.5rem;
                 font-weight: 700;
                 margin-bottom: 0.5rem;
-            }}
+            }
 
-            .header p {{
+            .header p {
                 font-size: 1.125rem;
                 opacity: 0.9;
                 font-weight: 300;
-            }}
+            }
 
-            .summary-section {{
+            .summary-section {
                 background: var(--surface-color);
                 border-radius: 1rem;
                 padding: 2rem;
                 margin-bottom: 2rem;
                 box-shadow: var(--shadow-md);
                 border: 1px solid var(--border-color);
-            }}
+            }
 
-            .summary-section h2 {{
+            .summary-section h2 {
                 color: var(--text-primary);
                 font-size: 1.5rem;
                 font-weight: 600;
@@ -438,80 +148,80 @@ def generate_advanced_report(datasets: Dict[str, Any], output_path: str) -> str:
                 display: flex;
                 align-items: center;
                 gap: 0.5rem;
-            }}
+            }
 
-            .summary-section h2::before {{
+            .summary-section h2::before {
                 content: '';
                 width: 4px;
                 height: 24px;
                 background: var(--primary-color);
                 border-radius: 2px;
-            }}
+            }
 
-            .dataset-grid {{
+            .dataset-grid {
                 display: grid;
                 grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
                 gap: 1.5rem;
                 margin-bottom: 1.5rem;
-            }}
+            }
 
-            .dataset-card {{
+            .dataset-card {
                 background: var(--surface-color);
                 border: 1px solid var(--border-color);
                 border-radius: 0.75rem;
                 padding: 1.5rem;
                 box-shadow: var(--shadow-sm);
                 transition: all 0.2s ease;
-            }}
+            }
 
-            .dataset-card:hover {{
+            .dataset-card:hover {
                 transform: translateY(-2px);
                 box-shadow: var(--shadow-md);
-            }}
+            }
 
-            .dataset-card h3 {{
+            .dataset-card h3 {
                 color: var(--primary-color);
                 font-size: 1.25rem;
                 font-weight: 600;
                 margin-bottom: 1rem;
-            }}
+            }
 
-            .metric-list {{
+            .metric-list {
                 list-style: none;
-            }}
+            }
 
-            .metric-item {{
+            .metric-item {
                 display: flex;
                 justify-content: space-between;
                 align-items: center;
                 padding: 0.5rem 0;
                 border-bottom: 1px solid var(--border-color);
-            }}
+            }
 
-            .metric-item:last-child {{
+            .metric-item:last-child {
                 border-bottom: none;
-            }}
+            }
 
-            .metric-label {{
+            .metric-label {
                 font-weight: 500;
                 color: var(--text-secondary);
-            }}
+            }
 
-            .metric-value {{
+            .metric-value {
                 font-weight: 600;
                 color: var(--text-primary);
-            }}
+            }
 
-            .chart-section {{
+            .chart-section {
                 background: var(--surface-color);
                 border-radius: 1rem;
                 padding: 2rem;
                 margin-bottom: 2rem;
                 box-shadow: var(--shadow-md);
                 border: 1px solid var(--border-color);
-            }}
+            }
 
-            .chart-title {{
+            .chart-title {
                 color: var(--text-primary);
                 font-size: 1.25rem;
                 font-weight: 600;
@@ -519,117 +229,60 @@ def generate_advanced_report(datasets: Dict[str, Any], output_path: str) -> str:
                 display: flex;
                 align-items: center;
                 gap: 0.5rem;
-            }}
+            }
 
-            .chart-title::before {{
+            .chart-title::before {
                 content: '';
                 width: 3px;
                 height: 20px;
                 background: var(--primary-color);
                 border-radius: 1.5px;
-            }}
+            }
 
-            .chart-container {{
+            .chart-container {
                 background: var(--surface-color);
                 border-radius: 0.5rem;
                 overflow: hidden;
-            }}
+            }
 
-            @media (max-width: 768px) {{
-                .container {{
+            @media (max-width: 768px) {
+                .container {
                     padding: 1rem;
-                }}
+                }
 
-                .header {{
+                .header {
                     padding: 2rem 1rem;
-                }}
+                }
 
-                .header h1 {{
+                .header h1 {
                     font-size: 2rem;
-                }}
+                }
 
-                .dataset-grid {{
+                .dataset-grid {
                     grid-template-columns: 1fr;
-                }}
-            }}
+                }
+            }
 
-            .loading {{
+            .loading {
                 display: flex;
                 justify-content: center;
                 align-items: center;
                 padding: 2rem;
                 color: var(--text-secondary);
-            }}
+            }
 
-            .error {{
+            .error {
                 background: #fef2f2;
                 border: 1px solid #fecaca;
                 color: #dc2626;
                 padding: 1rem;
                 border-radius: 0.5rem;
                 margin: 1rem 0;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>Informe Avanzado de Evaluacion RAG</h1>
-                <p>Analisis detallado de metricas con intervalos de confianza</p>
-            </div>
-            
-            <div class="summary-section">
-                <h2>Resumen de Datasets Evaluados</h2>
-                <div class="dataset-grid">
-    """
-    
-    # Añadir información de cada dataset
-    for dataset_name, data in datasets.items():
-        if 'summary_statistics' in data:
-            stats = data['summary_statistics']['retrieval_statistics']
-            html_content += f"""
-                    <div class="dataset-card">
-                        <h3>{dataset_name.upper()}</h3>
-                        <ul class="metric-list">
-                            <li class="metric-item">
-                                <span class="metric-label">Preguntas evaluadas</span>
-                                <span class="metric-value">{stats.get('total_questions', 0)}</span>
-                            </li>
-                            <li class="metric-item">
-                                <span class="metric-label">Consultas exitosas</span>
-                                <span class="metric-value">{stats.get('successful_queries', 0)}</span>
-                            </li>
-                            <li class="metric-item">
-                                <span class="metric-label">Tiempo promedio</span>
-                                <span class="metric-value">{stats.get('avg_processing_time', 0):.3f}s</span>
-                            </li>
-                            <li class="metric-item">
-                                <span class="metric-label">Chunks recuperados</span>
-                                <span class="metric-value">{stats.get('avg_retrieved_chunks', 0):.1f}</span>
-                            </li>
-                        </ul>
-                    </div>
-            """
-    
-    html_content += """
-                </div>
-            </div>
-    """
-    
-    # Añadir cada gráfico
-    for chart_title, chart in charts:
-        html_content += f"""
-            <div class="chart-section">
-                <div class="chart-title">{chart_title}</div>
-                <div class="chart-container">
-                    {chart.to_html(full_html=False, include_plotlyjs='cdn')}
-                </div>
-            </div>
-        """
-    
-    html_content += """
-        </div>
-        
+            }
+"""
+
+# Script de animaciones y exportación de datos; se inserta al final del <body>
+_JS_TEMPLATE = """
         <script>
             // Funcionalidad adicional para mejorar la experiencia de usuario
             document.addEventListener('DOMContentLoaded', function() {
@@ -701,18 +354,525 @@ def generate_advanced_report(datasets: Dict[str, Any], output_path: str) -> str:
                 };
             });
         </script>
+"""
+
+# Plantillas precompiladas del informe; los valores se sustituyen con string.Template
+_HEADER = string.Template("""
+    <!DOCTYPE html>
+    <html lang="es">
+    <head>
+        <meta charset="utf-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1">
+        <title>Informe Avanzado de Evaluacion RAG</title>
+        <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap" rel="stylesheet">
+        <script src="https://cdn.plot.ly/plotly-${plotly_js_version}.min.js"></script>
+        <style>
+""" + _CSS_TEMPLATE + """
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>Informe Avanzado de Evaluacion RAG</h1>
+                <p>Analisis detallado de metricas con intervalos de confianza</p>
+            </div>
+            
+            <div class="summary-section">
+                <h2>Resumen de Datasets Evaluados</h2>
+                <div class="dataset-grid">
+    """)
+
+_DATASET_CARD = string.Template("""
+                    <div class="dataset-card">
+                        <h3>$label</h3>
+                        <ul class="metric-list">
+                            <li class="metric-item">
+                                <span class="metric-label">Preguntas evaluadas</span>
+                                <span class="metric-value">$total_questions</span>
+                            </li>
+                            <li class="metric-item">
+                                <span class="metric-label">Consultas exitosas</span>
+                                <span class="metric-value">$successful_queries</span>
+                            </li>
+                            <li class="metric-item">
+                                <span class="metric-label">Tiempo promedio</span>
+                                <span class="metric-value">$avg_processing_time</span>
+                            </li>
+                            <li class="metric-item">
+                                <span class="metric-label">Chunks recuperados</span>
+                                <span class="metric-value">$avg_retrieved_chunks</span>
+                            </li>
+                        </ul>
+                    </div>
+            """)
+
+_SUMMARY_END = """
+                </div>
+            </div>
+    """
+
+_CHART_SECTION_START = string.Template("""
+            <div class="chart-section">
+                <div class="chart-title">$title</div>
+                <div class="chart-container">
+                    """)
+
+_CHART_SECTION_END = """
+                </div>
+            </div>
+        """
+
+_FOOTER = """
+        </div>
+        """ + _JS_TEMPLATE + """
     </body>
     </html>
     """
+
+def _read_json(path: str) -> Any:
+    """Lee y parsea un fichero de resultados."""
+    # Los resultados grandes se guardan comprimidos
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        return orjson.loads(f.read())
+
+@functools.lru_cache(maxsize=None)
+def _load_result_files(files: Tuple[Tuple[str, str, float], ...]) -> Dict[str, Any]:
+    """Parsea los ficheros (nombre, ruta, mtime); memoizado mientras no cambien en disco."""
+    if not files:
+        return {}
+    
+    # La lectura y la descompresión liberan el GIL, así que los ficheros se leen en paralelo
+    with ThreadPoolExecutor(max_workers=min(8, len(files))) as executor:
+        results = executor.map(_read_json, [path for _name, path, _mtime in files])
+        return {name: data for (name, _path, _mtime), data in zip(files, results)}
+
+def load_advanced_results(base_dir: str) -> Dict[str, Any]:
+    """Carga los resultados avanzados de evaluación; el resultado es compartido y no debe modificarse."""
+    files = []
+    
+    # Buscar archivos de resultados avanzados
+    dataset_names = ["fiqa", "squad_es"]
+    
+    for name in dataset_names:
+        advanced_path = os.path.join(base_dir, f"{name}_advanced_results.json")
+        
+        for path in (advanced_path, advanced_path + ".gz"):
+            if os.path.exists(path):
+                files.append((name, path, os.path.getmtime(path)))
+                break
+        else:
+            print(f"Advertencia: No se encontro el archivo de resultados avanzados para {name}")
+    
+    return _load_result_files(tuple(files))
+
+def _normalize(datasets: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Extrae en una sola pasada los datos que usan los gráficos y las tarjetas del informe.
+    
+    Devuelve {'ci': {DATASET: {métrica: (mean, ci_lower, ci_upper, std)}},
+    'retrieval': {DATASET: {hit_rate_at_k: valor}},
+    'stats': {DATASET: (total_questions, successful_queries, avg_processing_time, avg_retrieved_chunks)}}.
+    Cada sección tiene una entrada por dataset en el orden original, vacía si faltan
+    sus datos, para que los colores asignados por posición no cambien.
+    """
+    normalized = {'ci': {}, 'retrieval': {}, 'stats': {}}
     
-    # Guardar el archivo HTML
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    for dataset_name, data in datasets.items():
+        label = dataset_name.upper()
+        normalized['ci'][label] = {
+            metric_name: (stats['mean'], stats['ci_lower'], stats['ci_upper'], stats['std'])
+            for metric_name, stats in data.get('bootstrap_confidence_intervals', {}).items()
+        }
+        
+        summary = data.get('summary_statistics')
+        if summary:
+            normalized['retrieval'][label] = {
+                metric_name: value
+                for metric_name, value in summary['average_metrics'].items()
+                if 'hit_rate_at_' in metric_name
+            }
+            # Los valores por defecto se resuelven aquí una vez y se reutilizan en el dashboard y las tarjetas
+            stats = summary['retrieval_statistics']
+            normalized['stats'][label] = (
+                stats.get('total_questions', 0),
+                stats.get('successful_queries', 0),
+                stats.get('avg_processing_time', 0),
+                stats.get('avg_retrieved_chunks', 0),
+            )
+        else:
+            normalized['retrieval'][label] = {}
+            normalized['stats'][label] = ()
+    
+    return normalized
+
+def _add_raw_traces(fig: "go.Figure", traces: List[Dict[str, Any]]) -> None:
+    """Añade a `fig` trazas construidas como dicts, sin validarlas contra el esquema de Plotly."""
+    fig._validate = False
+    fig.add_traces(traces)
+
+def create_metrics_comparison_chart(normalized: Dict[str, Dict[str, Any]]) -> "go.Figure":
+    """Crea un gráfico comparativo de métricas con intervalos de confianza."""
+    import numpy as np
+    import pandas as pd
+    import plotly.graph_objects as go
+    
+    if not normalized['ci']:
+        return None
+    
+    # Preparar datos para el gráfico, una lista por columna
+    dataset_col, metric_col, means, ci_lower, ci_upper, stds = [], [], [], [], [], []
+    
+    for dataset_label, metrics in normalized['ci'].items():
+        for metric_name, (mean, lower, upper, std) in metrics.items():
+            dataset_col.append(dataset_label)
+            metric_col.append(metric_name)
+            means.append(mean)
+            ci_lower.append(lower)
+            ci_upper.append(upper)
+            stds.append(std)
+    
+    if not dataset_col:
+        return None
+    
+    df = pd.DataFrame({
+        'Dataset': dataset_col,
+        'Metric': metric_col,
+        'Mean': means,
+        'CI_Lower': ci_lower,
+        'CI_Upper': ci_upper,
+        'Std': stds
+    }, copy=False)
+    
+    # Pocas categorías distintas: codificarlas como categóricas evita comparar y hashear strings
+    df['Dataset'] = df['Dataset'].astype('category')
+    df['Metric'] = df['Metric'].astype('category')
+    
+    # Crear gráfico con barras y intervalos de confianza
+    fig = go.Figure()
+    
+    # Materializar las columnas una sola vez; cada dataset se toma después por posiciones
+    values = df[['Mean', 'Std', 'CI_Lower', 'CI_Upper']].to_numpy(dtype=np.float64)
+    metric_names = df['Metric'].to_numpy()
+    group_positions = df.groupby('Dataset', sort=False, observed=True).indices
+    
+    traces = []
+    for (dataset, positions), color in zip(group_positions.items(), itertools.cycle(_COLORS)):
+        group_values = values[positions]
+        means = group_values[:, 0]
+        traces.append(dict(
+            type='bar',
+            name=dataset,
+            x=metric_names[positions],
+            y=means,
+            error_y={**_ERROR_Y_BASE, 'array': group_values[:, 1]},
+            marker_color=color,
+            text=np.char.mod('%.3f', means),
+            textposition='auto',
+            hovertemplate=_HOVER_METRICS,
+            customdata=group_values[:, 1:]
+        ))
+    
+    _add_raw_traces(fig, traces)
+    
+    fig.update_layout(
+        title="Comparacion de Metricas con Intervalos de Confianza (95%)",
+        title_x=0.5,
+        title_font_size=20,
+        xaxis_title="Metricas",
+        yaxis_title="Puntuacion",
+        barmode='group',
+        height=600,
+        showlegend=True,
+        font_family="Arial, sans-serif",
+        plot_bgcolor='rgba(240, 240, 240, 0.95)',
+        paper_bgcolor='white',
+    )
+    
+    return fig
+
+def create_confidence_intervals_chart(normalized: Dict[str, Dict[str, Any]]) -> "go.Figure":
+    """Crea un gráfico específico para intervalos de confianza."""
+    import plotly.graph_objects as go
+    
+    if not normalized['ci']:
+        return None
+    
+    fig = go.Figure()
+    
+    traces = []
+    for (dataset_label, metrics), color in zip(normalized['ci'].items(), itertools.cycle(_COLORS)):
+        marker = {**_CI_MARKER_BASE, 'color': color}
+        for metric_name, (mean, ci_lower, ci_upper, _std) in metrics.items():
+            traces.append(dict(
+                type='scattergl',
+                x=[f"{dataset_label}_{metric_name}"],
+                y=[mean],
+                error_y={**_ERROR_Y_BASE, 'array': [mean - ci_lower], 'arrayminus': [ci_upper - mean]},
+                mode='markers+text',
+                name=f"{dataset_label} - {metric_name}",
+                marker=marker,
+                text=[f"{mean:.3f}"],
+                textposition='top center',
+                hovertemplate=_HOVER_CI,
+                customdata=[[ci_lower, ci_upper]]
+            ))
+    
+    _add_raw_traces(fig, traces)
+    
+    fig.update_layout(
+        title="Intervalos de Confianza por Metrica y Dataset",
+        title_x=0.5,
+        title_font_size=20,
+        xaxis_title="Dataset_Metrica",
+        yaxis_title="Puntuacion",
+        height=800,
+        showlegend=False,
+        font_family="Arial, sans-serif",
+        plot_bgcolor='rgba(240, 240, 240, 0.95)',
+        paper_bgcolor='white',
+    )
+    
+    return fig
+
+def create_retrieval_metrics_chart(normalized: Dict[str, Dict[str, Any]]) -> "go.Figure":
+    """Crea un gráfico específico para métricas de recuperación."""
+    import numpy as np
+    import plotly.graph_objects as go
+    
+    if not normalized['retrieval']:
+        return None
+    
+    fig = go.Figure()
+    
+    traces = []
+    for (dataset_label, retrieval_metrics), color in zip(normalized['retrieval'].items(), itertools.cycle(_COLORS)):
+        if retrieval_metrics:
+            x_values = list(retrieval_metrics.keys())
+            y_values = np.fromiter(retrieval_metrics.values(), dtype=np.float64, count=len(retrieval_metrics))
+            
+            traces.append(dict(
+                type='scattergl',
+                x=x_values,
+                y=y_values,
+                mode='lines+markers',
+                name=dataset_label,
+                marker={**_HIT_RATE_MARKER_BASE, 'color': color},
+                line=_HIT_RATE_LINE,
+                hovertemplate=_HOVER_HIT_RATE
+            ))
+    
+    _add_raw_traces(fig, traces)
+    
+    fig.update_layout(
+        title="Metricas de Recuperacion por Dataset",
+        title_x=0.5,
+        title_font_size=20,
+        xaxis_title="K (Numero de resultados)",
+        yaxis_title="Hit Rate",
+        height=500,
+        showlegend=True,
+        font_family="Arial, sans-serif",
+        plot_bgcolor='rgba(240, 240, 240, 0.95)',
+        paper_bgcolor='white',
+    )
+    
+    return fig
+
+def create_performance_dashboard(normalized: Dict[str, Dict[str, Any]]) -> "go.Figure":
+    """Crea un dashboard de rendimiento del sistema."""
+    import numpy as np
+    import plotly.graph_objects as go
+    
+    if not normalized['stats']:
+        return None
+    
+    # Crear la rejilla de subplots a partir de la disposición precalculada
+    fig = go.Figure(layout=_DASHBOARD_LAYOUT)
+    
+    # Una fila por dataset con estadísticas; cada subplot se dibuja con una sola traza
+    labels, bar_colors, totals, successes, times, chunks = [], [], [], [], [], []
+    for (dataset_label, stats), color in zip(normalized['stats'].items(), itertools.cycle(_COLORS)):
+        if not stats:
+            continue
+        total_questions, successful_queries, avg_processing_time, avg_retrieved_chunks = stats
+        labels.append(dataset_label)
+        bar_colors.append(color)
+        totals.append(total_questions)
+        successes.append(successful_queries)
+        times.append(avg_processing_time)
+        chunks.append(avg_retrieved_chunks)
+    
+    if labels:
+        # Una latencia no registrada (null en el JSON) pasa a NaN: sin barra y "n/d" en la tabla
+        times = np.asarray(times, dtype=np.float64)
+        chunks = np.asarray(chunks, dtype=np.float64)
+        
+        # Tasa de éxito agregada; varios indicadores en el mismo subplot se solapaban
+        success_rate = sum(successes) / max(sum(totals), 1)
+        
+        traces = [
+            # Tiempo de procesamiento
+            dict(
+                type='bar',
+                x=labels,
+                y=times,
+                name="Tiempo",
+                marker_color=bar_colors,
+                showlegend=False
+            ),
+            # Chunks recuperados
+            dict(
+                type='bar',
+                x=labels,
+                y=chunks,
+                name="Chunks",
+                marker_color=bar_colors,
+                showlegend=False,
+                xaxis='x2',
+                yaxis='y2'
+            ),
+            # Tasa de éxito
+            dict(
+                type='indicator',
+                mode="gauge+number+delta",
+                value=success_rate * 100,
+                domain={'x': _DASHBOARD_LEFT_COL, 'y': _DASHBOARD_BOTTOM_ROW},
+                title={'text': f"Éxito {' / '.join(labels)}"},
+                gauge={
+                    'axis': {'range': [None, 100]},
+                    'bar': {'color': _COLORS[0]},
+                    'steps': [
+                        {'range': [0, 50], 'color': "lightgray"},
+                        {'range': [50, 80], 'color': "gray"},
+                        {'range': [80, 100], 'color': "darkgray"}
+                    ],
+                    'threshold': {
+                        'line': {'color': "red", 'width': 4},
+                        'thickness': 0.75,
+                        'value': 90
+                    }
+                }
+            ),
+            # Tabla de estadísticas
+            dict(
+                type='table',
+                domain={'x': _DASHBOARD_RIGHT_COL, 'y': _DASHBOARD_BOTTOM_ROW},
+                header=dict(
+                    values=['Dataset', 'Total Q', 'Éxitos', 'Tiempo Prom', 'Chunks Prom'],
+                    fill_color='paleturquoise',
+                    align='left'
+                ),
+                cells=dict(
+                    values=[
+                        labels,
+                        totals,
+                        successes,
+                        ["n/d" if np.isnan(t) else f"{t:.3f}s" for t in times],
+                        np.char.mod('%.1f', chunks)
+                    ],
+                    fill_color='lavender',
+                    align='left'
+                )
+            ),
+        ]
+        _add_raw_traces(fig, traces)
+    
+    fig.update_layout(
+        title="Dashboard de Rendimiento del Sistema RAG",
+        title_x=0.5,
+        title_font_size=20,
+        height=800,
+        showlegend=False,
+        font_family="Arial, sans-serif",
+        plot_bgcolor='rgba(240, 240, 240, 0.95)',
+        paper_bgcolor='white',
+    )
+    
+    return fig
+
+def generate_advanced_report(datasets: Dict[str, Any], output_path: str) -> str:
+    """Genera un informe HTML avanzado con múltiples visualizaciones."""
+    if not datasets:
+        return None
+    
+    import plotly.graph_objects as go
+    import plotly.io as pio
+    from plotly.offline import get_plotlyjs_version
+    
+    # Serializar las figuras con orjson en lugar del json de la biblioteca estándar
+    pio.json.config.default_engine = "orjson"
+    
+    normalized = _normalize(datasets)
+    
+    # Crear todas las visualizaciones; cada una depende solo de una sección de `normalized`
+    chart_builders = [
+        ("Comparación de Métricas", create_metrics_comparison_chart, 'ci'),
+        ("Intervalos de Confianza", create_confidence_intervals_chart, 'ci'),
+        ("Métricas de Recuperación", create_retrieval_metrics_chart, 'retrieval'),
+        ("Dashboard de Rendimiento", create_performance_dashboard, 'stats'),
+    ]
+    charts = []
+    
+    # Cada figura se cachea en disco junto a la huella de la sección que la genera, así
+    # que regenerar el informe sin cambios en esos datos no reconstruye ningún gráfico.
+    # Se guarda una sola entrada por gráfico: una huella distinta sobrescribe la anterior.
+    with shelve.open(CHART_CACHE_PATH) as chart_cache:
+        written = False
+        for chart_title, builder, section in chart_builders:
+            # Las secciones sin datos en ningún dataset no generan gráfico (antes quedaban vacíos)
+            if not any(normalized[section].values()):
+                continue
+            fingerprint = blake2b(orjson.dumps([CHARTS_VERSION, normalized[section]]), digest_size=16).hexdigest()
+            cached_fingerprint, chart_json = chart_cache.get(builder.__name__, (None, None))
+            if cached_fingerprint == fingerprint:
+                # Reconstruir la figura sin validar evita repetir el recorrido del esquema de Plotly
+                chart = go.Figure(chart_json, _validate=False) if chart_json else None
+            else:
+                chart = builder(normalized)
+                chart_cache[builder.__name__] = (fingerprint, chart.to_plotly_json() if chart else None)
+                written = True
+            if chart:
+                charts.append((chart_title, chart))
+        
+        # Descartar entradas de gráficos que ya no existen o del formato de clave anterior
+        if written:
+            for stale_key in set(chart_cache) - {builder.__name__ for _, builder, _ in chart_builders}:
+                del chart_cache[stale_key]
+    
+    if not charts:
+        return None
+    
+    # Escribir el HTML por secciones directamente al archivo, sin construir el documento completo en memoria
+    with open(output_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+        f.write(_HEADER.substitute(plotly_js_version=get_plotlyjs_version()))
+        
+        # Añadir información de cada dataset
+        for dataset_label, stats in normalized['stats'].items():
+            if stats:
+                total_questions, successful_queries, avg_processing_time, avg_retrieved_chunks = stats
+                f.write(_DATASET_CARD.substitute(
+                    label=dataset_label,
+                    total_questions=total_questions,
+                    successful_queries=successful_queries,
+                    avg_processing_time="n/d" if avg_processing_time is None else f"{avg_processing_time:.3f}s",
+                    avg_retrieved_chunks=f"{avg_retrieved_chunks:.1f}"
+                ))
+        
+        f.write(_SUMMARY_END)
+        
+        # Añadir cada gráfico
+        for chart_title, chart in charts:
+            f.write(_CHART_SECTION_START.substitute(title=chart_title))
+            # Plotly.js ya se carga una sola vez en el <head>
+            f.write(chart.to_html(full_html=False, include_plotlyjs=False, include_mathjax=False, validate=False))
+            f.write(_CHART_SECTION_END)
+        
+        f.write(_FOOTER)
     
     print(f"Informe avanzado generado en: {os.path.abspath(output_path)}")
     return os.path.abspath(output_path)
 
-def main():
+def main(argv=None) -> int:
     """Función principal para generar el informe avanzado."""
     parser = argparse.ArgumentParser(description="Genera un informe HTML avanzado con métricas de evaluación del RAG.")
     parser.add_argument(
@@ -721,7 +881,7 @@ def main():
         choices=['fiqa', 'squad_es'], 
         help="Nombre del dataset para mostrar. Si no se especifica, se mostrarán todos."
     )
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # Obtener la ruta del directorio donde se encuentra este script
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -732,7 +892,7 @@ def main():
     if not all_datasets:
         print("Error: No se encontraron archivos de resultados avanzados.")
         print("Ejecute primero 'evaluate_advanced.py' para generar los resultados.")
-        return
+        return 1
 
     # Filtrar el dataset si se ha especificado
     if args.dataset:
@@ -740,7 +900,7 @@ def main():
             datasets_to_show = {args.dataset: all_datasets[args.dataset]}
         else:
             print(f"Error: No se encontraron resultados para el dataset '{args.dataset}'.")
-            return
+            return 1
     else:
         datasets_to_show = all_datasets
 
@@ -760,6 +920,9 @@ def main():
             print(report_path)
     else:
         print("Error: No se pudo generar el informe avanzado")
+        return 1
+    
+    return 0
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main())
@@ -1,9 +1,38 @@
-import json
 import os
+import string
+import sys
 import webbrowser
 import argparse
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    # orjson es opcional; json.loads de la biblioteca estándar también acepta bytes
+    from json import loads as _json_loads
+
+# Nombres de archivo fijos basados en el script de evaluación
+_DATASET_NAMES = ("fiqa", "squad_es")
+
+# Plotly usa solo tantos colores como barras tenga cada traza
+_COLOR_PALETTE = ('#005f73', '#0a9396', '#94d2bd', '#e9d8a6', '#ee9b00', '#ca6702', '#bb3e03', '#ae2012', '#9b2226')
+
+# Documento del informe; la figura se inserta ya serializada con plotly.io.to_json
+_HTML_TEMPLATE = string.Template("""<!doctype html>
+<html>
+<head>
+    <meta charset="utf-8" />
+    <style>html, body {height: 100%;}</style>
+    <script charset="utf-8" src="https://cdn.plot.ly/plotly-${plotly_js_version}.min.js"></script>
+</head>
+<body>
+    <div id="report" class="plotly-graph-div" style="height:${height}px; width:100%;"></div>
+    <script>
+        var fig = ${figure};
+        Plotly.newPlot("report", fig.data, fig.layout, {"responsive": true});
+    </script>
+</body>
+</html>
+""")
 
 def generate_interactive_report(datasets, output_path):
     """Genera un informe HTML interactivo con Plotly."""
@@ -11,6 +40,13 @@ def generate_interactive_report(datasets, output_path):
     if not datasets:
         return None
 
+    # Importaciones pesadas solo cuando hay algo que dibujar; --help y las salidas tempranas no las pagan
+    import numpy as np
+    import plotly.graph_objects as go
+    import plotly.io as pio
+    from plotly.offline import get_plotlyjs_version
+    from plotly.subplots import make_subplots
+
     fig = make_subplots(
         rows=len(datasets), 
         cols=1, 
@@ -18,23 +54,19 @@ def generate_interactive_report(datasets, output_path):
         vertical_spacing=0.15 if len(datasets) > 1 else 0
     )
 
-    color_palette = ['#005f73', '#0a9396', '#94d2bd', '#e9d8a6', '#ee9b00', '#ca6702', '#bb3e03', '#ae2012', '#9b2226']
-    
     for i, (name, data) in enumerate(datasets.items()):
         if "summary" in data:
             avg_metrics = data["summary"].get("average_metrics", {})
-            metrics_names = list(avg_metrics.keys())
-            metrics_values = list(avg_metrics.values())
-            
-            bar_colors = color_palette[:len(metrics_names)]
+            metrics_names = tuple(avg_metrics)
+            metrics_values = np.fromiter(avg_metrics.values(), dtype=np.float64, count=len(avg_metrics))
 
             fig.add_trace(
                 go.Bar(
                     x=metrics_names,
                     y=metrics_values,
-                    text=[f"{v:.4f}" for v in metrics_values],
+                    text=np.char.mod("%.4f", metrics_values).tolist(),
                     textposition='auto',
-                    marker_color=bar_colors,
+                    marker_color=_COLOR_PALETTE,
                     name='Métricas Promedio'
                 ),
                 row=i + 1,
@@ -42,77 +74,78 @@ def generate_interactive_report(datasets, output_path):
             )
             fig.update_yaxes(title_text="Puntuación", row=i + 1, col=1, range=[0, 1])
 
+    height = 400 * len(datasets) + 100
     fig.update_layout(
         title_text="📊 Informe Interactivo de Métricas de Evaluación RAG",
         title_x=0.5,
         title_font_size=24,
         font_family="Arial, sans-serif",
         showlegend=False,
-        height=400 * len(datasets) + 100,
+        height=height,
         margin=dict(t=100, b=80, l=80, r=80),
         plot_bgcolor='rgba(240, 240, 240, 0.95)',
         paper_bgcolor='white',
     )
 
-    fig.write_html(output_path, full_html=True, include_plotlyjs='cdn')
+    # Plantilla fija + to_json sin validar, en lugar del recorrido completo de write_html
+    with open(output_path, "w", encoding="utf-8", buffering=64 * 1024) as f:
+        f.write(_HTML_TEMPLATE.substitute(
+            plotly_js_version=get_plotlyjs_version(),
+            height=height,
+            figure=pio.to_json(fig, validate=False)
+        ))
     
-    print(f"Informe interactivo generado en: {os.path.abspath(output_path)}")
-    return os.path.abspath(output_path)
+    abs_output_path = os.path.abspath(output_path)
+    print(f"Informe interactivo generado en: {abs_output_path}")
+    return abs_output_path
 
 
-def find_and_load_results(base_dir):
-    """Encuentra y carga los archivos de resultados de la evaluación."""
+def find_and_load_results(base_dir, names=_DATASET_NAMES):
+    """Encuentra y carga los archivos de resultados de la evaluación de los datasets `names`."""
     datasets = {}
+    join = os.path.join
     
-    # Asumiendo nombres de archivo fijos basados en el script de evaluación
-    dataset_names = ["fiqa", "squad_es"]
-    
-    for name in dataset_names:
-        summary_path = os.path.join(base_dir, f"{name}_results.json")
+    for name in names:
+        summary_path = join(base_dir, f"{name}_results.json")
         
-        dataset_data = {}
-        if os.path.exists(summary_path):
-            with open(summary_path, "r", encoding="utf-8") as f:
-                # Cargamos solo el resumen, que es lo que necesitamos para los gráficos
-                dataset_data["summary"] = json.load(f)
-        else:
+        try:
+            f = open(summary_path, "rb")
+        except FileNotFoundError:
             # No imprimimos advertencia si no se encuentra, simplemente no se añade.
-            pass
-
-        if dataset_data:
-            datasets[name] = dataset_data
+            continue
+        
+        with f:
+            # Cargamos solo el resumen, que es lo que necesitamos para los gráficos
+            datasets[name] = {"summary": _json_loads(f.read())}
             
     return datasets
 
-def main():
+def main(argv=None) -> int:
     """Función principal para generar y mostrar el informe."""
     parser = argparse.ArgumentParser(description="Genera un informe HTML interactivo con las métricas de evaluación del RAG.")
     parser.add_argument(
         "--dataset", 
         type=str, 
-        choices=['fiqa', 'squad_es'], 
+        choices=_DATASET_NAMES, 
         help="Nombre del dataset para mostrar. Si no se especifica, se mostrarán todos."
     )
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # Obtener la ruta del directorio donde se encuentra este script
     script_dir = os.path.dirname(os.path.abspath(__file__))
     
-    all_datasets = find_and_load_results(base_dir=script_dir)
+    # Si se especifica un dataset, solo se lee su archivo
+    datasets_to_show = find_and_load_results(
+        base_dir=script_dir,
+        names=(args.dataset,) if args.dataset else _DATASET_NAMES
+    )
     
-    if not all_datasets:
-        print("No se encontraron archivos de resultados. Ejecute primero 'evaluate.py'.")
-        return
-
-    # Filtrar el dataset si se ha especificado
-    if args.dataset:
-        if args.dataset in all_datasets:
-            datasets_to_show = {args.dataset: all_datasets[args.dataset]}
-        else:
+    if not datasets_to_show:
+        if args.dataset:
             print(f"Error: No se encontraron resultados para el dataset '{args.dataset}'.")
-            return
-    else:
-        datasets_to_show = all_datasets
+        else:
+            print("No se encontraron archivos de resultados. Ejecute primero 'evaluate.py'.")
+        return 1
 
     report_path = generate_interactive_report(datasets_to_show, output_path=os.path.join(script_dir, "evaluation_report.html"))
     
@@ -124,6 +157,8 @@ def main():
             print(f"No se pudo abrir el informe en el navegador: {e}")
             print("Por favor, abra el siguiente archivo manualmente en su navegador:")
             print(report_path)
+    
+    return 0 if report_path else 1
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main())